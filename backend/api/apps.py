@@ -1,6 +1,38 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULT_PRERENDER_BASE_URL = 'http://localhost'
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        if settings.RESPONSE_CACHE_TIMEOUT and not settings.SHARED_CACHE:
+            raise ImproperlyConfigured(
+                'RESPONSE_CACHE_TIMEOUT требует общего кэша '
+                '(DJANGO_CACHE_BACKEND): с кэшем процесса воркеры '
+                'не видят инвалидацию друг друга.'
+            )
+        if settings.AUTH_MODE == 'jwt' and not settings.SHARED_CACHE:
+            raise ImproperlyConfigured(
+                'AUTH_MODE=jwt требует общего кэша (DJANGO_CACHE_BACKEND): '
+                'через него все процессы узнают об отозванных токенах '
+                'и отключённых пользователях.'
+            )
+
+        if settings.PRERENDER_ROOT and settings.PRERENDER_BASE_URL in (
+            '', DEFAULT_PRERENDER_BASE_URL
+        ):
+            raise ImproperlyConfigured(
+                'PRERENDER_ROOT требует PRERENDER_BASE_URL: ссылки в '
+                'готовых ответах ведут на этот адрес, а не на localhost.'
+            )
+
+        from . import events  # noqa: F401
+
+        # Обработчик тянет за собой DRF; без PRERENDER_ROOT он не нужен.
+        if settings.PRERENDER_ROOT:
+            from . import prerender  # noqa: F401
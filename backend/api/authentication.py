@@ -0,0 +1,115 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.models import RevokedToken, StatelessUser
+from users.state import is_active_user
+
+DENYLIST_VERSION_KEY = 'auth:denylist-version'
+DENYLIST_SYNC_INTERVAL = 1.0
+
+
+class TokenDenylist:
+    """Множество отозванных jti в памяти процесса.
+
+    Актуальность проверяется по метке версии в общем кэше не чаще
+    раза в DENYLIST_SYNC_INTERVAL секунд; таблица перечитывается
+    только когда метка изменилась.
+    """
+
+    def __init__(self):
+        self._revoked = frozenset()
+        self._version = None
+        self._checked_at = 0.0
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._checked_at < DENYLIST_SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        version = cache.get(DENYLIST_VERSION_KEY, '')
+        if version == self._version:
+            return
+        self._revoked = frozenset(
+            int(jti, 16) for jti in
+            RevokedToken.objects.filter(expires_at__gt=timezone.now())
+            .values_list('jti', flat=True)
+        )
+        self._version = version
+
+    def is_revoked(self, jti):
+        self._sync()
+        return int(jti, 16) in self._revoked
+
+    def revoke(self, jti, expires_at):
+        RevokedToken.objects.filter(expires_at__lte=timezone.now()).delete()
+        RevokedToken.objects.get_or_create(
+            jti=jti,
+            defaults={'expires_at': expires_at},
+        )
+        cache.set(DENYLIST_VERSION_KEY, uuid.uuid4().hex, None)
+        self._checked_at = 0.0
+
+
+denylist = TokenDenylist()
+
+
+def revoke_token(token):
+    denylist.revoke(
+        token[api_settings.JTI_CLAIM],
+        datetime_from_epoch(token['exp']),
+    )
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """JWT-аутентификация без обращения к базе на каждый запрос.
+
+    Пользователь собирается из claim'ов токена с отложенными полями:
+    строка из users_user читается, только если представлению нужны
+    данные сверх id. Что пользователь не отключён и не удалён, для
+    чтения проверяется по признаку в общем кэше (users.state), а для
+    изменяющих запросов — по самой строке.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, token = result
+        if request.method in SAFE_METHODS:
+            if not is_active_user(user.pk):
+                raise AuthenticationFailed('Пользователь неактивен.')
+            return result
+        user = StatelessUser.objects.filter(
+            pk=user.pk, is_active=True, deleted_at__isnull=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('Пользователь неактивен.')
+        return user, token
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        try:
+            revoked = denylist.is_revoked(token[api_settings.JTI_CLAIM])
+        except (KeyError, ValueError):
+            revoked = True
+        if revoked:
+            raise InvalidToken('Токен отозван.')
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Токен не содержит идентификатора.')
+        return StatelessUser.from_db(
+            None, [api_settings.USER_ID_FIELD], [user_id]
+        )
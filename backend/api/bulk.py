@@ -0,0 +1,89 @@
+from django.db import connections, transaction
+from rest_framework import serializers
+
+BULK_MAX_IDS = 100
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS,
+    )
+
+
+def _results(ids, statuses):
+    return [{'id': pk, 'status': statuses[pk]} for pk in ids]
+
+
+def _execute_returning(related_manager, target_field, sql, params):
+    """Выполняет sql с подставленными именами и возвращает id целей.
+
+    Добавленными и удалёнными считаются только строки из RETURNING:
+    если параллельный запрос успел первым, строки там не будет, и
+    счётчики не изменятся дважды.
+    """
+    model = related_manager.model
+    connection = connections[related_manager.db]
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            table=quote(model._meta.db_table),
+            owner=quote(model._meta.get_field(
+                related_manager.field.name
+            ).column),
+            target=quote(model._meta.get_field(target_field).column),
+        ), params)
+        return {row[0] for row in cursor.fetchall()}
+
+
+@transaction.atomic
+def bulk_link(related_manager, target_field, targets, ids):
+    """Создаёт связи владельца менеджера с объектами ids.
+
+    Один SELECT проверяет существование целей, один
+    INSERT ... ON CONFLICT DO NOTHING RETURNING создаёт недостающие
+    связи и сообщает, какие из них вставлены этим запросом. Модель
+    связи не должна иметь других обязательных полей.
+    Возвращает результаты по каждому id и список добавленных id.
+    """
+    ids = list(dict.fromkeys(ids))
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    inserted = set()
+    if found:
+        owner_id = related_manager.instance.pk
+        inserted = _execute_returning(
+            related_manager,
+            target_field,
+            'INSERT INTO {table} ({owner}, {target}) VALUES '
+            + ', '.join(['(%s, %s)'] * len(found))
+            + ' ON CONFLICT DO NOTHING RETURNING {target}',
+            [value for pk in found for value in (owner_id, pk)],
+        )
+    statuses = {
+        pk: ADDED if pk in inserted else EXISTS if pk in found else NOT_FOUND
+        for pk in ids
+    }
+    return _results(ids, statuses), [pk for pk in ids if pk in inserted]
+
+
+@transaction.atomic
+def bulk_unlink(related_manager, target_field, ids):
+    """Удаляет связи с объектами ids одним DELETE ... RETURNING."""
+    ids = list(dict.fromkeys(ids))
+    removed = _execute_returning(
+        related_manager,
+        target_field,
+        'DELETE FROM {table} WHERE {owner} = %s AND {target} IN ('
+        + ', '.join(['%s'] * len(ids))
+        + ') RETURNING {target}',
+        [related_manager.instance.pk, *ids],
+    )
+    statuses = {pk: REMOVED if pk in removed else ABSENT for pk in ids}
+    return _results(ids, statuses), [pk for pk in ids if pk in removed]
@@ -0,0 +1,112 @@
+import hashlib
+
+from django.db.models import Count, Exists, Max, OuterRef, Sum, Window
+from django.utils.cache import (
+    get_conditional_response,
+    patch_vary_headers,
+    quote_etag,
+)
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Follow
+
+# Для сортировок по рейтингу порядок зависит не только от updated_at.
+ORDERING_STAMPS = {
+    'popular': Sum('popularity'),
+    'trending': Sum('trending_score'),
+}
+
+
+AUTHOR_STAMP = (
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'author__avatar',
+)
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(
+        '|'.join(map(str, parts)).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    return quote_etag(digest)
+
+
+def conditional_response(request, etag, build_response):
+    """Отдаёт 304 при совпадении If-None-Match, не вызывая build_response."""
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build_response()
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+def _page_bounds(request, paginator):
+    size = paginator.get_page_size(request)
+    try:
+        number = int(request.query_params.get(paginator.page_query_param, 1))
+    except ValueError:
+        number = 1
+    start = (max(number, 1) - 1) * size
+    return start, start + size
+
+
+def recipe_list_etag(queryset, request, paginator, facets_queryset=None):
+    """ETag страницы списка рецептов для гостя.
+
+    Строки страницы отвечают за её состав и порядок: избранное,
+    переехавшее с рецепта на рецепт, не меняет ни сумму popularity, ни
+    updated_at. Агрегаты по всей выборке (для count) считаются оконными
+    функциями в том же запросе. Профиль автора входит в ответ, но не
+    меняет updated_at рецепта сразу. Фасет тегов зависит и от рецептов
+    вне выбранных тегов, поэтому для фасетов нужен второй запрос.
+    """
+    query_params = request.query_params
+    stamps = {
+        'stamp_updated': Window(Max('updated_at')),
+        'stamp_total': Window(Count('id')),
+    }
+    ordering = query_params.get('ordering')
+    if ordering in ORDERING_STAMPS:
+        stamps['stamp_score'] = Window(ORDERING_STAMPS[ordering])
+    start, stop = _page_bounds(request, paginator)
+    page = queryset.annotate(**stamps).values_list(
+        'id', 'updated_at', *AUTHOR_STAMP, *stamps
+    )
+    facets = ()
+    if facets_queryset is not None:
+        facets = facets_queryset.order_by().aggregate(
+            last_update=Max('updated_at'), total=Count('id')
+        ).values()
+    return make_etag(
+        'recipes', query_params.urlencode(), *facets, *page[start:stop],
+    )
+
+
+def recipe_detail_etag(queryset, pk, user):
+    """ETag рецепта с флагами текущего пользователя; None — рецепта нет."""
+    try:
+        queryset = queryset.filter(pk=pk).order_by()
+    except (TypeError, ValueError):
+        return None
+    # Профиль автора входит в ответ, но не меняет updated_at рецепта.
+    fields = ['updated_at', *AUTHOR_STAMP]
+    if not user.is_anonymous:
+        queryset = queryset.annotate(
+            favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            in_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            subscribed=Exists(
+                Follow.objects.filter(user=user, author=OuterRef('author'))
+            ),
+        )
+        fields += ['favorited', 'in_cart', 'subscribed']
+    stamp = queryset.values_list(*fields).first()
+    if stamp is None:
+        return None
+    return make_etag('recipe', pk, user.pk, *stamp)
@@ -0,0 +1,366 @@
+"""Server-Sent Events: новые рецепты авторов из подписок.
+
+GET /api/events/ держит соединение и присылает событие recipe, когда
+автор из подписок публикует рецепт. Токен передаётся в заголовке
+Authorization. EventSource заголовков не передаёт, поэтому браузер
+сначала получает билет (POST /api/events/ticket/) и открывает поток
+с ?ticket=: билет одноразовый и живёт TICKET_TIMEOUT секунд, так что
+адрес в журналах не раскрывает учётных данных.
+Поток обслуживает EventStreamASGI без Django-обработчика запросов:
+соединение — это одна корутина и одна очередь, поэтому процесс под
+ASGI-сервером держит тысячи простаивающих подписчиков.
+
+Внутри процесса события раздаёт Broker. Между процессами их передаёт
+бэкенд из EVENTS_BACKEND: LocalBackend — только текущий процесс,
+PostgresBackend — LISTEN/NOTIFY, без отдельного брокера сообщений.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.http import HttpRequest
+from django.utils.module_loading import import_string
+
+from recipes.models import Recipe
+from users.models import Follow, User
+
+logger = logging.getLogger(__name__)
+
+PATH = '/api/events/'
+HEARTBEAT_SECONDS = 20
+QUEUE_SIZE = 100
+
+# Билеты потока хранятся в кэше: выдаёт их бэкенд, гасит сервис events.
+TICKET_PREFIX = 'events:ticket:'
+TICKET_TIMEOUT = 30
+
+# Конец потока: подписчик не успевает читать события.
+OVERFLOW = object()
+
+
+class Subscription:
+    """Очередь одного соединения; пополняется из любого потока."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.channels = set()
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+
+class Broker:
+    """Подписчики текущего процесса по каналам."""
+
+    def __init__(self):
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, subscription, channels):
+        channels = set(channels)
+        with self.lock:
+            subscription.channels.update(channels)
+            for channel in channels:
+                self.channels.setdefault(channel, set()).add(subscription)
+
+    def unsubscribe(self, subscription, channels=None):
+        channels = set(
+            subscription.channels if channels is None else channels
+        )
+        with self.lock:
+            subscription.channels -= channels
+            for channel in channels:
+                subscribers = self.channels.get(channel)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+
+    def dispatch(self, channel, message):
+        with self.lock:
+            subscribers = list(self.channels.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+
+class LocalBackend:
+    """События не выходят за пределы процесса (разработка и тесты)."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def start(self):
+        pass
+
+    def publish(self, channel, message):
+        self.broker.dispatch(channel, message)
+
+
+class PostgresBackend:
+    """Рассылка между процессами через LISTEN/NOTIFY PostgreSQL."""
+
+    PG_CHANNEL = 'foodgram_events'
+    RECONNECT_SECONDS = 5
+
+    def __init__(self, broker):
+        self.broker = broker
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def start(self):
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(
+                    target=self._listen, name='events-listener', daemon=True
+                )
+                self.listener.start()
+
+    def publish(self, channel, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [
+                self.PG_CHANNEL,
+                json.dumps({'channel': channel, 'message': message}),
+            ])
+
+    def _listen(self):
+        import psycopg2
+
+        while True:
+            try:
+                listener = psycopg2.connect(
+                    **connection.get_connection_params()
+                )
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f'LISTEN {self.PG_CHANNEL}')
+                while True:
+                    select.select([listener], [], [], HEARTBEAT_SECONDS)
+                    listener.poll()
+                    while listener.notifies:
+                        notify = listener.notifies.pop(0)
+                        event = json.loads(notify.payload)
+                        self.broker.dispatch(
+                            event['channel'], event['message']
+                        )
+            except Exception:
+                logger.exception('Соединение LISTEN потеряно')
+                time.sleep(self.RECONNECT_SECONDS)
+
+
+broker = Broker()
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.EVENTS_BACKEND)(broker)
+    return _backend
+
+
+def publish(channel, event, data):
+    """Отправляет событие подписчикам channel после фиксации транзакции."""
+    message = {'event': event, 'data': data}
+    transaction.on_commit(lambda: get_backend().publish(channel, message))
+
+
+def author_channel(author_id):
+    return f'author:{author_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def following_changed(user, added=(), removed=()):
+    """Сообщает открытым потокам пользователя об изменении подписок."""
+    if added or removed:
+        publish(user_channel(user.id), 'following', {
+            'added': list(added), 'removed': list(removed),
+        })
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        publish(author_channel(instance.author_id), 'recipe', {
+            'id': instance.id,
+            'name': instance.name,
+            'author': instance.author_id,
+        })
+
+
+def issue_ticket(user):
+    """Одноразовый билет для открытия потока от имени user."""
+    ticket = secrets.token_urlsafe(24)
+    cache.set(TICKET_PREFIX + ticket, user.pk, TICKET_TIMEOUT)
+    return ticket
+
+
+def _redeem_ticket(ticket):
+    key = TICKET_PREFIX + ticket
+    user_id = cache.get(key)
+    # Из двух запросов с одним билетом удалить его сумеет только один.
+    if user_id is None or not cache.delete(key):
+        return None
+    return User.objects.filter(
+        pk=user_id, is_active=True, deleted_at__isnull=True
+    ).first()
+
+
+def _user_from_header(authorization):
+    # DRF нужен только потоку событий, а модуль загружается в ready().
+    from rest_framework.exceptions import APIException
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    request = HttpRequest()
+    request.META['HTTP_AUTHORIZATION'] = authorization
+    try:
+        user = Request(request, authenticators=[
+            authentication() for authentication in
+            api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ]).user
+    except APIException:
+        return None
+    return None if user.is_anonymous else user
+
+
+def _authenticate(authorization, ticket):
+    try:
+        if authorization:
+            user = _user_from_header(authorization)
+        elif ticket:
+            user = _redeem_ticket(ticket)
+        else:
+            user = None
+        if user is None:
+            return None, ()
+        return user, list(
+            Follow.objects.filter(user=user)
+            .values_list('author_id', flat=True)
+        )
+    finally:
+        close_old_connections()
+
+
+def format_event(message):
+    data = json.dumps(message['data'], ensure_ascii=False)
+    return f'event: {message["event"]}\ndata: {data}\n\n'.encode()
+
+
+class EventStreamASGI:
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') != PATH:
+            return await self.application(scope, receive, send)
+        headers = dict(scope['headers'])
+        authorization = headers.get(b'authorization', b'').decode()
+        ticket = parse_qs(
+            scope.get('query_string', b'').decode()
+        ).get('ticket', [''])[0]
+        user, authors = await sync_to_async(_authenticate)(
+            authorization, ticket
+        )
+        if user is None:
+            await send({
+                'type': 'http.response.start',
+                'status': 401,
+                'headers': [(b'content-type', b'application/json')],
+            })
+            await send({
+                'type': 'http.response.body',
+                'body': json.dumps({
+                    'detail': 'Учетные данные не были предоставлены.'
+                }).encode(),
+            })
+            return
+        get_backend().start()
+        subscription = Subscription(asyncio.get_running_loop())
+        broker.subscribe(subscription, [
+            user_channel(user.id), *map(author_channel, authors)
+        ])
+        try:
+            await self._stream(subscription, receive, send)
+        finally:
+            broker.unsubscribe(subscription)
+
+    async def _stream(self, subscription, receive, send):
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {HEARTBEAT_SECONDS * 1000}\n\n'.encode(),
+            'more_body': True,
+        })
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                message = asyncio.ensure_future(subscription.queue.get())
+                done, _ = await asyncio.wait(
+                    {message, disconnected},
+                    timeout=HEARTBEAT_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    message.cancel()
+                    return
+                if message not in done:
+                    message.cancel()
+                    body = b': ping\n\n'
+                elif message.result() is OVERFLOW:
+                    break
+                elif message.result()['event'] == 'following':
+                    data = message.result()['data']
+                    broker.subscribe(
+                        subscription, map(author_channel, data['added'])
+                    )
+                    broker.unsubscribe(
+                        subscription, map(author_channel, data['removed'])
+                    )
+                    continue
+                else:
+                    body = format_event(message.result())
+                await send({
+                    'type': 'http.response.body',
+                    'body': body,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
@@ -0,0 +1,31 @@
+"""Выгрузка всего каталога рецептов в NDJSON.
+
+Строки читаются одним запросом через .iterator() (на PostgreSQL —
+серверный курсор) в порядке id, теги и ингредиенты подгружаются
+пачками по chunk_size, поэтому память не растёт с размером каталога.
+Выгрузку можно продолжить с последнего полученного id (after).
+"""
+import itertools
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from recipes.models import Recipe
+
+from .flat import flat_recipe, serialize_recipes
+
+CHUNK_SIZE = 500
+
+
+def export_lines(request, after=0, chunk_size=CHUNK_SIZE):
+    """Строки NDJSON в формате ответа /api/recipes/{id}/ для request."""
+    rows = (
+        Recipe.objects.filter(id__gt=after).order_by('id')
+        .values(*flat_recipe.columns)
+        .iterator(chunk_size=chunk_size)
+    )
+    while batch := list(itertools.islice(rows, chunk_size)):
+        for item in serialize_recipes(batch, request):
+            yield json.dumps(
+                item, cls=JSONEncoder, ensure_ascii=False
+            ) + '\n'
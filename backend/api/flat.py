@@ -0,0 +1,211 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from recipes.models import Favorite, Recipe, RecipeIngredient, ShoppingCart
+from recipes.serializers import (
+    IngredientSerializer,
+    RecipeIngredientReadSerializer,
+    RecipeReadSerializer,
+    ShortRecipeSerializer,
+    TagSerializer,
+)
+from users.models import Follow
+from users.serializers import UserSerializer
+
+User = get_user_model()
+
+# Значения этих полей из .values() уже совпадают с to_representation.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.ReadOnlyField,
+)
+
+
+def _column(row_key):
+    return lambda row, context: row[row_key]
+
+
+def _converted(row_key, field):
+    def represent(row, context):
+        value = row[row_key]
+        return None if value is None else field.to_representation(value)
+    return represent
+
+
+def image_url(row_key, storage):
+    """Повторяет ImageField.to_representation для имени файла из строки."""
+    def represent(row, context):
+        name = row[row_key]
+        if not name:
+            return None
+        url = storage.url(name)
+        request = context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return represent
+
+
+class FlatSerializer:
+    """Сериализатор чтения, работающий со строками .values().
+
+    План (ключ ответа → функция от строки) строится один раз по полям
+    обычного сериализатора, поэтому порядок и формат ключей совпадают.
+    Поля со связанными данными или SerializerMethodField задаются в
+    extra функциями (row, context) -> value.
+    """
+
+    def __init__(self, serializer_class, prefix='', extra=None,
+                 extra_columns=()):
+        self.serializer_class = serializer_class
+        self.prefix = prefix
+        self.extra = extra or {}
+        self.columns = []
+        self.plan = self._compile()
+        self.columns.extend(extra_columns)
+
+    def _compile(self):
+        model = self.serializer_class.Meta.model
+        plan = []
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.extra:
+                plan.append((name, self.extra[name]))
+                continue
+            if isinstance(
+                field,
+                (serializers.ManyRelatedField, serializers.BaseSerializer),
+            ) or field.source == '*':
+                raise TypeError(
+                    f'{self.serializer_class.__name__}.{name}: '
+                    'для вложенных полей нужен обработчик в extra'
+                )
+            source = field.source.replace('.', '__')
+            row_key = self.prefix + source
+            self.columns.append(row_key)
+            if isinstance(field, serializers.ImageField):
+                storage = model._meta.get_field(source).storage
+                plan.append((name, image_url(row_key, storage)))
+            elif isinstance(field, PASSTHROUGH_FIELDS):
+                plan.append((name, _column(row_key)))
+            else:
+                plan.append((name, _converted(row_key, field)))
+        return plan
+
+    def represent(self, row, context):
+        return {name: getter(row, context) for name, getter in self.plan}
+
+    def represent_many(self, rows, context):
+        plan = self.plan
+        return [
+            {name: getter(row, context) for name, getter in plan}
+            for row in rows
+        ]
+
+
+def _is_subscribed(author_key):
+    return lambda row, context: row[author_key] in context['subscribed']
+
+
+def _user_serializer(prefix):
+    return FlatSerializer(
+        UserSerializer,
+        prefix=prefix,
+        extra={
+            'is_subscribed': _is_subscribed(f'{prefix}id'),
+            'avatar': image_url(
+                f'{prefix}avatar', User._meta.get_field('avatar').storage
+            ),
+        },
+        extra_columns=[f'{prefix}avatar'],
+    )
+
+
+flat_user = _user_serializer('')
+flat_ingredient = FlatSerializer(IngredientSerializer)
+flat_short_recipe = FlatSerializer(ShortRecipeSerializer)
+flat_tag = FlatSerializer(TagSerializer, prefix='tag__')
+flat_recipe_ingredient = FlatSerializer(RecipeIngredientReadSerializer)
+_flat_author = _user_serializer('author__')
+flat_recipe = FlatSerializer(
+    RecipeReadSerializer,
+    extra={
+        'tags': lambda row, context: context['tags'][row['id']],
+        'author': lambda row, context: _flat_author.represent(row, context),
+        'ingredients': (
+            lambda row, context: context['ingredients'][row['id']]
+        ),
+        'is_favorited': lambda row, context: row['id'] in context['favorited'],
+        'is_in_shopping_cart': (
+            lambda row, context: row['id'] in context['in_cart']
+        ),
+    },
+    extra_columns=_flat_author.columns,
+)
+
+
+def _subscribed_ids(request, author_ids):
+    user = getattr(request, 'user', None)
+    if user is None or user.is_anonymous:
+        return frozenset()
+    return frozenset(
+        Follow.objects.filter(user=user, author_id__in=author_ids)
+        .values_list('author_id', flat=True)
+    )
+
+
+def _user_recipe_ids(model, request, recipe_ids):
+    user = request.user
+    if user.is_anonymous:
+        return frozenset()
+    return frozenset(
+        model.objects.filter(user=user, recipe_id__in=recipe_ids)
+        .values_list('recipe_id', flat=True)
+    )
+
+
+def serialize_users(rows, request):
+    context = {
+        'request': request,
+        'subscribed': _subscribed_ids(request, [row['id'] for row in rows]),
+    }
+    return flat_user.represent_many(rows, context)
+
+
+def serialize_recipes(rows, request):
+    """Данные как у RecipeReadSerializer(many=True) для строк .values()."""
+    recipe_ids = [row['id'] for row in rows]
+    if not recipe_ids:
+        return []
+    tags = defaultdict(list)
+    for row in (
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('tag')
+        .values('recipe_id', *flat_tag.columns)
+    ):
+        tags[row['recipe_id']].append(flat_tag.represent(row, {}))
+    ingredients = defaultdict(list)
+    for row in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by('ingredient')
+        .values('recipe_id', *flat_recipe_ingredient.columns)
+    ):
+        ingredients[row['recipe_id']].append(
+            flat_recipe_ingredient.represent(row, {})
+        )
+    context = {
+        'request': request,
+        'tags': tags,
+        'ingredients': ingredients,
+        'favorited': _user_recipe_ids(Favorite, request, recipe_ids),
+        'in_cart': _user_recipe_ids(ShoppingCart, request, recipe_ids),
+        'subscribed': _subscribed_ids(
+            request, {row['author__id'] for row in rows}
+        ),
+    }
+    return flat_recipe.represent_many(rows, context)
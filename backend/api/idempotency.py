@@ -0,0 +1,147 @@
+"""Заголовок Idempotency-Key для повторов создания и загрузок.
+
+Запись IdempotencyKey вставляется и фиксируется до выполнения действия,
+а после него получает ответ. Уникальный индекс (пользователь, ключ)
+не даёт выполнить действие дважды: дубль, пришедший, пока первый
+запрос ещё выполняется, получает 409, а после — сохранённый ответ.
+Долгая загрузка изображения при этом не держит открытой транзакцию.
+Если первый запрос закончился ошибкой, запись удаляется и повтор
+выполняется заново; запись, оставшуюся от упавшего процесса, повтор
+занимает через PENDING_TIMEOUT. Сохраняются только успешные ответы.
+
+Отпечаток запроса считается по разобранным данным, а не по
+request.body: тело не читается в память целиком и не упирается
+в DATA_UPLOAD_MAX_MEMORY_SIZE.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+METHODS = ('POST', 'PUT', 'PATCH')
+
+# Столько запрос может выполняться, прежде чем повтор займёт его ключ.
+PENDING_TIMEOUT = timedelta(minutes=5)
+
+
+def expired_before():
+    return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+
+def _file_digest(value):
+    if not isinstance(value, UploadedFile):
+        return str(value)
+    digest = hashlib.sha256()
+    for chunk in value.chunks():
+        digest.update(chunk)
+    value.seek(0)
+    return digest.hexdigest()
+
+
+def fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    digest = hashlib.sha256()
+    for part in (
+        request.method,
+        request.get_full_path(),
+        json.dumps(data, sort_keys=True, default=_file_digest),
+    ):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _acquire(user, key, request_fingerprint):
+    """Вставляет запись-блокировку или находит запись дубля.
+
+    Возвращает пару (запись, вставлена ли она этим запросом).
+    """
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                user=user, key=key, fingerprint=request_fingerprint
+            ), True
+    except IntegrityError:
+        pass
+    stored = IdempotencyKey.objects.get(user=user, key=key)
+    if stored.status_code is None:
+        expires = timezone.now() - PENDING_TIMEOUT
+    else:
+        expires = expired_before()
+    if stored.created_at >= expires:
+        return stored, False
+    # Запись устарела. Если её уже заменил другой повтор, удаление
+    # ничего не тронет и _acquire вернёт его запись.
+    IdempotencyKey.objects.filter(
+        pk=stored.pk, created_at=stored.created_at
+    ).delete()
+    return _acquire(user, key, request_fingerprint)
+
+
+def _replay(stored, request_fingerprint):
+    if stored.status_code is None:
+        return Response(
+            {'errors': 'Запрос с этим ключом идемпотентности '
+                       'ещё выполняется.'},
+            status=status.HTTP_409_CONFLICT,
+        )
+    if stored.fingerprint != request_fingerprint:
+        return Response(
+            {'errors': 'Ключ идемпотентности уже использован '
+                       'для другого запроса.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(stored.response, status=stored.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view_method):
+    """Выполняет метод представления не больше раза на ключ запроса."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if (
+            key is None
+            or request.method not in METHODS
+            or request.user.is_anonymous
+        ):
+            return view_method(self, request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'errors': f'{HEADER}: от 1 до {MAX_KEY_LENGTH} символов.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        request_fingerprint = fingerprint(request)
+        record, acquired = _acquire(request.user, key, request_fingerprint)
+        if not acquired:
+            return _replay(record, request_fingerprint)
+        keys = IdempotencyKey.objects.filter(pk=record.pk)
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except BaseException:
+            keys.delete()
+            raise
+        if status.is_success(response.status_code):
+            keys.update(
+                status_code=response.status_code, response=response.data
+            )
+        else:
+            keys.delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,40 @@
+"""Вход и выход в режиме AUTH_MODE = 'jwt'.
+
+Модуль подключается в api.urls только в этом режиме, чтобы в режиме
+токенов simplejwt не загружался вовсе.
+"""
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from djoser.views import TokenCreateView
+from rest_framework import status, views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import revoke_token
+
+
+class JWTTokenCreateView(TokenCreateView):
+    def _action(self, serializer):
+        user = serializer.user
+        user_logged_in.send(
+            sender=user.__class__,
+            request=self.request,
+            user=user,
+        )
+        return Response(
+            {'auth_token': str(AccessToken.for_user(user))},
+            status=status.HTTP_200_OK,
+        )
+
+
+class JWTTokenDestroyView(views.APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        revoke_token(request.auth)
+        user_logged_out.send(
+            sender=request.user.__class__,
+            request=request,
+            user=request.user,
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,75 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.flat import flat_recipe, serialize_recipes
+from recipes.models import Recipe
+from recipes.serializers import RecipeReadSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare RecipeReadSerializer with the flat .values() serializer '
+        'on the newest recipes in the database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--user', help='Email of the requesting user')
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = AnonymousUser()
+        if options['user']:
+            request.user = User.objects.filter(email=options['user']).first()
+            if request.user is None:
+                raise CommandError(f'No user {options["user"]}')
+        limit = options['limit']
+        if not Recipe.objects.exists():
+            raise CommandError('No recipes to benchmark')
+
+        def classic():
+            return RecipeReadSerializer(
+                Recipe.objects.all()[:limit],
+                many=True,
+                context={'request': request},
+            ).data
+
+        def flat():
+            rows = list(Recipe.objects.values(*flat_recipe.columns)[:limit])
+            return serialize_recipes(rows, request)
+
+        renderer = JSONRenderer()
+        if renderer.render(classic()) != renderer.render(flat()):
+            raise CommandError('Flat output differs from RecipeReadSerializer')
+
+        results = {}
+        for name, serialize in (('classic', classic), ('flat', flat)):
+            with CaptureQueriesContext(connection) as queries:
+                serialize()
+            best = min(
+                self._timed(serialize) for _ in range(options['repeat'])
+            )
+            results[name] = best
+            self.stdout.write(
+                f'{name:>8}: {best * 1000:8.2f} ms, '
+                f'{len(queries)} queries'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Speedup: {results["classic"] / results["flat"]:.1f}x'))
+
+    @staticmethod
+    def _timed(function):
+        started = time.perf_counter()
+        function()
+        return time.perf_counter() - started
@@ -0,0 +1,53 @@
+import gzip
+import sys
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+
+from api.export import CHUNK_SIZE, export_lines
+from api.prerender import build_request
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream every recipe as NDJSON in id order; resume an interrupted '
+        'export with --after <last exported id>'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--after', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--output', '-o',
+            help='File to write; stdout by default',
+        )
+        parser.add_argument('--gzip', action='store_true')
+
+    def handle(self, *args, **options):
+        # Абсолютные ссылки на картинки строятся от PRERENDER_BASE_URL.
+        request = build_request('/api/recipes/export/')
+        request.user = AnonymousUser()
+        lines = export_lines(
+            request, options['after'], options['chunk_size']
+        )
+        stream = self.open_output(options['output'], options['gzip'])
+        try:
+            stream.writelines(lines)
+        finally:
+            if stream is sys.stdout:
+                stream.flush()
+            else:
+                stream.close()
+
+    def open_output(self, path, compress):
+        # Дозапись: после --after новые строки продолжают тот же файл,
+        # для gzip это ещё один валидный член архива.
+        if compress:
+            return gzip.open(
+                path or sys.stdout.buffer,
+                'at' if path else 'wt',
+                encoding='utf-8',
+            )
+        if path:
+            return open(path, 'a', encoding='utf-8')
+        return sys.stdout
@@ -0,0 +1,108 @@
+import json
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.memory import snapshot_path
+
+
+def kib(size):
+    return f'{size / 1024:10.1f}'
+
+
+class Command(BaseCommand):
+    help = (
+        'Report per-route memory usage collected by MemoryProfileMiddleware '
+        'and the memory growth of each worker since its baseline snapshot'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir',
+            default=settings.MEMORY_PROFILING_DIR,
+            help='Directory with worker statistics (MEMORY_PROFILING_DIR)',
+        )
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--route',
+            default='',
+            help='Show only routes containing this text',
+        )
+
+    def handle(self, *args, **options):
+        if not options['dir']:
+            raise CommandError(
+                'Memory profiling is disabled: set MEMORY_PROFILING_DIR '
+                'or pass --dir.'
+            )
+        directory = Path(options['dir'])
+        workers = [
+            json.loads(path.read_text())
+            for path in sorted(directory.glob('*.json'))
+        ]
+        if not workers:
+            raise CommandError(f'No statistics in {directory}')
+        self._routes(workers, options['route'], options['top'])
+        self._growth(directory, workers, options['top'])
+
+    def _routes(self, workers, route_filter, top):
+        routes = {}
+        for worker in workers:
+            for route, stats in worker['routes'].items():
+                if route_filter not in route:
+                    continue
+                total = routes.setdefault(route, {
+                    'requests': 0,
+                    'peak_total': 0,
+                    'peak_max': 0,
+                    'retained_total': 0,
+                    'sites': [],
+                })
+                total['requests'] += stats['requests']
+                total['peak_total'] += stats['peak_total']
+                total['peak_max'] = max(total['peak_max'], stats['peak_max'])
+                total['retained_total'] += stats['retained_total']
+                if stats['sites']:
+                    total['sites'] = stats['sites']
+        self.stdout.write(
+            'Routes by average peak, KiB '
+            '(requests, avg peak, max peak, avg retained):'
+        )
+        for route, stats in sorted(
+            routes.items(),
+            key=lambda item: -item[1]['peak_total'] / item[1]['requests'],
+        ):
+            requests = stats['requests']
+            self.stdout.write(
+                f'{requests:8d}{kib(stats["peak_total"] / requests)}'
+                f'{kib(stats["peak_max"])}'
+                f'{kib(stats["retained_total"] / requests)}  {route}'
+            )
+            for site in stats['sites'][:top]:
+                self.stdout.write(
+                    f'{"":8}{kib(site["size"])} KiB '
+                    f'{site["count"]:+7d} blocks  {site["site"]}'
+                )
+
+    def _growth(self, directory, workers, top):
+        for worker in workers:
+            baseline = snapshot_path(directory, worker['pid'], 'baseline')
+            latest = snapshot_path(directory, worker['pid'], 'latest')
+            if not (baseline.exists() and latest.exists()):
+                continue
+            self.stdout.write(
+                f'\nWorker {worker["pid"]}: growth over '
+                f'{worker["requests"] - worker["baseline_requests"]} '
+                'requests since the baseline snapshot:'
+            )
+            differences = tracemalloc.Snapshot.load(latest).compare_to(
+                tracemalloc.Snapshot.load(baseline), 'lineno'
+            )
+            for diff in differences[:top]:
+                frame = diff.traceback[0]
+                self.stdout.write(
+                    f'{kib(diff.size_diff)} KiB {diff.count_diff:+7d} '
+                    f'blocks  {frame.filename}:{frame.lineno}'
+                )
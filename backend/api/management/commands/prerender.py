@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.prerender import (
+    existing_urls,
+    file_path,
+    hot_urls,
+    is_enabled,
+    prerender,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Write JSON for the hottest anonymous recipe URLs into '
+        'PRERENDER_ROOT for nginx to serve; run periodically from cron'
+    )
+
+    def handle(self, *args, **options):
+        if not is_enabled():
+            raise CommandError('PRERENDER_ROOT is not set')
+        urls = hot_urls()
+        written = sum(prerender(url) for url in urls)
+        stale = existing_urls().difference(urls)
+        for url in stale:
+            file_path(url).unlink(missing_ok=True)
+        self.stdout.write(self.style.SUCCESS(
+            f'Prerendered {written} of {len(urls)} URLs, '
+            f'removed {len(stale)} stale files'
+        ))
@@ -0,0 +1,108 @@
+import json
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)')
+
+# Выполняется в отдельном процессе, чтобы импорты шли с нуля.
+CHILD = '''
+import io, json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings_module!r})
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.conf import settings
+from django.utils.module_loading import import_string
+application = import_string(settings.WSGI_APPLICATION)
+loaded = time.perf_counter()
+hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host]
+statuses = []
+body = b''.join(application({{
+    'REQUEST_METHOD': 'GET',
+    'PATH_INFO': {path!r},
+    'QUERY_STRING': '',
+    'HTTP_HOST': (hosts or ['localhost'])[0].lstrip('.'),
+    'SERVER_NAME': 'localhost',
+    'SERVER_PORT': '80',
+    'wsgi.url_scheme': 'http',
+    'wsgi.input': io.BytesIO(),
+    'wsgi.errors': sys.stderr,
+}}, lambda status, headers: statuses.append(status)))
+finished = time.perf_counter()
+print(json.dumps({{
+    'setup': setup_done - started,
+    'application': loaded - setup_done,
+    'first_request': finished - loaded,
+    'status': statuses[0],
+}}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Boot the project in a fresh interpreter and report import time '
+        'per module and package, and the time to the first request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--path',
+            default='/api/tags/',
+            help='Path requested as the first request',
+        )
+
+    def handle(self, *args, **options):
+        code = CHILD.format(
+            settings_module=settings.SETTINGS_MODULE,
+            path=options['path'],
+        )
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', code],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+        )
+        if result.returncode:
+            raise CommandError(result.stderr[-2000:])
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        modules = [
+            (int(self_us), int(cumulative_us), len(indent) // 2, name)
+            for self_us, cumulative_us, indent, name in
+            IMPORT_LINE.findall(result.stderr)
+        ]
+        packages = defaultdict(int)
+        for self_us, _, _, name in modules:
+            packages[name.split('.')[0]] += self_us
+        top = options['top']
+
+        self.stdout.write(f'Imported modules: {len(modules)}')
+        self.stdout.write(
+            f'Import time: {sum(row[0] for row in modules) / 1000:.1f} ms'
+        )
+        self.stdout.write('\nPackages by own import time, ms:')
+        for name, total in sorted(
+            packages.items(), key=lambda item: -item[1]
+        )[:top]:
+            self.stdout.write(f'  {total / 1000:8.1f}  {name}')
+        self.stdout.write('\nProject and top-level imports by cumulative '
+                          'time, ms:')
+        for _, cumulative, _, name in sorted(
+            (row for row in modules if row[2] == 0),
+            key=lambda row: -row[1],
+        )[:top]:
+            self.stdout.write(f'  {cumulative / 1000:8.1f}  {name}')
+        self.stdout.write(
+            '\n'
+            f'django.setup():        {timings["setup"] * 1000:8.1f} ms\n'
+            f'WSGI application:      {timings["application"] * 1000:8.1f} ms\n'
+            f'First request ({options["path"]}): '
+            f'{timings["first_request"] * 1000:.1f} ms '
+            f'[{timings["status"]}]'
+        )
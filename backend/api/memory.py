@@ -0,0 +1,136 @@
+"""Профилирование памяти запросов через tracemalloc.
+
+Включается настройкой MEMORY_PROFILING_DIR: MemoryProfileMiddleware
+запускает tracemalloc и для каждого маршрута (метод + имя URL) считает
+пиковый прирост памяти за запрос и память, оставшуюся после него.
+Каждый EVERY-й запрос маршрута снимается парой снимков до и после —
+по их разнице видно, какие строки кода оставили выделения. Каждые
+EVERY запросов воркер сохраняет статистику и снимок всего процесса:
+первый снимок — базовый, сравнение последнего с ним показывает рост
+памяти за прошедшие запросы. Файлы читает manage.py memory_report.
+"""
+import json
+import os
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+TOP_SITES = 10
+SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def take_snapshot():
+    return tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+
+
+def top_sites(new, old, limit=TOP_SITES):
+    sites = []
+    for diff in new.compare_to(old, 'lineno')[:limit]:
+        if diff.size_diff <= 0:
+            continue
+        frame = diff.traceback[0]
+        sites.append({
+            'site': f'{frame.filename}:{frame.lineno}',
+            'size': diff.size_diff,
+            'count': diff.count_diff,
+        })
+    return sites
+
+
+def stats_path(directory, pid):
+    return Path(directory) / f'{pid}.json'
+
+
+def snapshot_path(directory, pid, name):
+    return Path(directory) / f'{pid}.{name}.snapshot'
+
+
+def _replace(path, write):
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix='.', suffix='.tmp'
+    )
+    os.close(descriptor)
+    try:
+        write(temporary)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def _route(request):
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return f'{request.method} <404>'
+    return f'{request.method} {match.view_name or match.route}'
+
+
+class MemoryProfileMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.directory = Path(settings.MEMORY_PROFILING_DIR)
+        self.every = settings.MEMORY_PROFILING_EVERY
+        self.routes = {}
+        self.requests = 0
+        self.baseline_requests = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_PROFILING_FRAMES)
+
+    def __call__(self, request):
+        route = _route(request)
+        stats = self.routes.setdefault(route, {
+            'requests': 0,
+            'peak_total': 0,
+            'peak_max': 0,
+            'retained_total': 0,
+            'sites': [],
+        })
+        before_snapshot = (
+            take_snapshot() if stats['requests'] % self.every == 0 else None
+        )
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+
+        response = self.get_response(request)
+
+        after, peak = tracemalloc.get_traced_memory()
+        stats['requests'] += 1
+        stats['peak_total'] += peak - before
+        stats['peak_max'] = max(stats['peak_max'], peak - before)
+        stats['retained_total'] += after - before
+        if before_snapshot is not None:
+            stats['sites'] = top_sites(take_snapshot(), before_snapshot)
+        self.requests += 1
+        if self.requests % self.every == 0:
+            self.dump()
+        return response
+
+    def dump(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        pid = os.getpid()
+        name = 'latest'
+        if self.baseline_requests is None:
+            name = 'baseline'
+            self.baseline_requests = self.requests
+        _replace(
+            snapshot_path(self.directory, pid, name), take_snapshot().dump
+        )
+        content = json.dumps({
+            'pid': pid,
+            'requests': self.requests,
+            'baseline_requests': self.baseline_requests,
+            'routes': self.routes,
+        })
+        _replace(
+            stats_path(self.directory, pid),
+            lambda path: Path(path).write_text(content),
+        )
@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+
+class IdempotencyKey(models.Model):
+    """Сохранённый ответ на запрос с заголовком Idempotency-Key."""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='Пользователь',
+    )
+    key = models.CharField('Ключ', max_length=255)
+    fingerprint = models.CharField('Отпечаток запроса', max_length=64)
+    status_code = models.PositiveSmallIntegerField('Код ответа', null=True)
+    response = models.JSONField(
+        'Тело ответа', null=True, encoder=DjangoJSONEncoder
+    )
+    created_at = models.DateTimeField('Создан', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'key'],
+                name='unique_idempotency_key',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                name='idempotency_created_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.key}'
@@ -5,4 +5,5 @@ class IsAuthorOrReadOnly(BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in SAFE_METHODS:
             return True
-        return getattr(obj, 'author', None) == request.user
+        # Сравнение по id не загружает автора отдельным запросом.
+        return getattr(obj, 'author_id', None) == request.user.id
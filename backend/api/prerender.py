@@ -0,0 +1,204 @@
+"""Готовые JSON-ответы для гостей, которые nginx отдаёт без бэкенда.
+
+Файл для адреса /api/recipes/?page=1&limit=6 лежит в
+PRERENDER_ROOT/api/recipes/?page=1&limit=6.json, для карточки —
+PRERENDER_ROOT/api/recipes/5/.json: так их находит try_files
+$uri$is_args$args.json. Страницы списка строятся в том же виде, в
+каком их запрашивает фронтенд (page, limit, затем tags в порядке тегов).
+Файлы пишутся во временный файл и переименовываются, поэтому nginx
+никогда не отдаёт недописанный ответ. При изменении рецептов
+затронутые файлы перестраивает фоновая задача; изменения, которых нет
+в готовых ответах (рейтинг, страницы автора), задачу не ставят.
+"""
+import io
+import itertools
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.dispatch import receiver
+from django.urls import resolve
+from rest_framework import status
+
+from jobs.queue import task
+from recipes.generations import generations_bumped
+from recipes.models import Recipe, Tag
+from recipes.ranking import ORDERINGS
+
+from .pagination import LimitPageNumberPagination
+
+LIST_PATH = '/api/recipes/'
+SUFFIX = '.json'
+# При большем числе тегов строятся только «все», «ни одного» и по одному.
+MAX_COMBINED_TAGS = 4
+# Области поколений, от которых зависят готовые файлы (см. generations).
+PRERENDERED_SCOPES = ('all', 'list')
+PRERENDERED_SCOPE_PREFIXES = ('tag:', 'recipe:')
+
+
+def is_enabled():
+    return bool(settings.PRERENDER_ROOT)
+
+
+def list_url(page, tag_slugs=()):
+    query = f'page={page}&limit={LimitPageNumberPagination.page_size}'
+    query += ''.join(f'&tags={slug}' for slug in tag_slugs)
+    return f'{LIST_PATH}?{query}'
+
+
+def detail_url(recipe_id):
+    return f'{LIST_PATH}{recipe_id}/'
+
+
+def tag_combinations(slugs):
+    if len(slugs) <= MAX_COMBINED_TAGS:
+        return [
+            combination
+            for size in range(len(slugs) + 1)
+            for combination in itertools.combinations(slugs, size)
+        ]
+    return [(), tuple(slugs), *((slug,) for slug in slugs)]
+
+
+def list_urls(combinations, pages):
+    return [
+        list_url(page, combination)
+        for combination in combinations
+        for page in range(1, pages + 1)
+    ]
+
+
+def hot_urls():
+    slugs = list(Tag.objects.values_list('slug', flat=True))
+    top = Recipe.objects.order_by(*ORDERINGS['popular']).values_list(
+        'id', flat=True
+    )[:settings.PRERENDER_TOP_RECIPES]
+    return [
+        *list_urls(tag_combinations(slugs), settings.PRERENDER_LIST_PAGES),
+        *(detail_url(recipe_id) for recipe_id in top),
+    ]
+
+
+def file_path(url):
+    return Path(settings.PRERENDER_ROOT) / (url.lstrip('/') + SUFFIX)
+
+
+def build_request(url):
+    """Гостевой GET-запрос к адресу на хосте PRERENDER_BASE_URL.
+
+    Кэш ответов не используется: запись в нём могла устареть, а файл
+    отдаётся nginx всем гостям до следующего перестроения. Ограничения
+    частоты тоже: это не запрос клиента.
+    """
+    base = urlsplit(settings.PRERENDER_BASE_URL)
+    parts = urlsplit(url)
+    request = WSGIRequest({
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'HTTP_HOST': base.netloc,
+        'wsgi.url_scheme': base.scheme,
+        'wsgi.input': io.BytesIO(),
+    })
+    request.bypass_response_cache = True
+    request.bypass_throttling = True
+    return request
+
+
+def render(url):
+    """Тело ответа гостю или None, если ответ не 200."""
+    match = resolve(urlsplit(url).path)
+    response = match.func(build_request(url), *match.args, **match.kwargs)
+    if response.status_code != status.HTTP_200_OK:
+        return None
+    return response.render().content
+
+
+def write_atomic(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix='.', suffix='.tmp'
+    )
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def prerender(url):
+    """Перестраивает файл адреса; True, если файл записан."""
+    content = render(url)
+    path = file_path(url)
+    if content is None:
+        path.unlink(missing_ok=True)
+        return False
+    write_atomic(path, content)
+    return True
+
+
+def existing_urls():
+    root = Path(settings.PRERENDER_ROOT)
+    if not root.is_dir():
+        return set()
+    return {
+        '/' + str(path.relative_to(root))[:-len(SUFFIX)]
+        for path in root.rglob('*' + SUFFIX)
+    }
+
+
+def clear():
+    shutil.rmtree(settings.PRERENDER_ROOT, ignore_errors=True)
+
+
+def affected_urls(scopes):
+    slugs = {scope[4:] for scope in scopes if scope.startswith('tag:')}
+    combinations = [
+        combination for combination in tag_combinations(
+            list(Tag.objects.values_list('slug', flat=True))
+        )
+        if slugs.intersection(combination)
+        or (not combination and 'list' in scopes)
+    ]
+    details = [
+        detail_url(scope[7:]) for scope in scopes
+        if scope.startswith('recipe:')
+    ]
+    return [
+        *list_urls(combinations, settings.PRERENDER_LIST_PAGES),
+        *(url for url in details if file_path(url).exists()),
+    ]
+
+
+@task
+def prerender_urls(urls):
+    for url in urls:
+        prerender(url)
+
+
+@task
+def refresh_scopes(scopes):
+    if 'all' in scopes:
+        # Поменялось то, что есть во всех ответах: файлы удаляются,
+        # новые построит следующий запуск manage.py prerender.
+        clear()
+        return
+    prerender_urls(affected_urls(set(scopes)))
+
+
+@receiver(generations_bumped)
+def refresh_prerendered(sender, scopes, **kwargs):
+    scopes = sorted(
+        scope for scope in scopes
+        if scope in PRERENDERED_SCOPES
+        or scope.startswith(PRERENDERED_SCOPE_PREFIXES)
+    )
+    if is_enabled() and scopes:
+        refresh_scopes.defer(scopes)
@@ -0,0 +1,127 @@
+"""Кэш готовых ответов для анонимных запросов к рецептам.
+
+Ключ состоит из адреса запроса, нормализованных параметров и текущих
+счётчиков поколений (см. recipes.generations), поэтому записи
+инвалидируются без перебора ключей. Пересчёт истёкшей записи выполняет
+один запрос (single-flight): остальные в это время получают устаревшую
+копию или коротко ждут, пока лидер её положит.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipes.generations import get_generations
+from recipes.ranking import ORDERINGS
+
+from .conditional import make_etag
+
+# Параметры, от которых зависит ответ гостю; остальные отбрасываются,
+# чтобы произвольные параметры не плодили записи.
+LIST_PARAMS = ('author', 'facets', 'limit', 'ordering', 'page', 'tags')
+STALE_TIMEOUT = 30
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2.0
+WAIT_INTERVAL = 0.05
+
+
+def is_enabled():
+    return settings.RESPONSE_CACHE_TIMEOUT > 0
+
+
+def list_scopes(query_params):
+    tags = sorted(set(query_params.getlist('tags')))
+    author = query_params.get('author')
+    scopes = ['all']
+    if tags:
+        scopes += [f'tag:{slug}' for slug in tags]
+    if author:
+        scopes.append(f'author:{author}')
+    # Фасет тегов считается без фильтра по тегам.
+    if not author and (not tags or query_params.get('facets')):
+        scopes.append('list')
+    if query_params.get('ordering') in ORDERINGS:
+        scopes.append('ranking')
+    return scopes
+
+
+def _normalized(query_params, allowed):
+    return '&'.join(
+        f'{name}={value}'
+        for name in allowed
+        for value in sorted(set(query_params.getlist(name)))
+        if value
+    )
+
+
+def _cache_key(request, scopes, allowed):
+    base = '|'.join((
+        request.scheme,
+        request.get_host(),
+        request.path,
+        _normalized(request.query_params, allowed),
+    ))
+    generations = get_generations(scopes)
+    return 'response:' + hashlib.md5(
+        f'{base}|{generations}'.encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _build(key, build_response):
+    response = build_response()
+    if response.status_code == status.HTTP_200_OK:
+        timeout = settings.RESPONSE_CACHE_TIMEOUT
+        cache.set(
+            key,
+            {'data': response.data, 'fresh_until': time.time() + timeout},
+            timeout + STALE_TIMEOUT,
+        )
+    return response
+
+
+def _fetch(key, build_response):
+    entry = cache.get(key)
+    if entry is not None and entry['fresh_until'] > time.time():
+        return Response(entry['data'])
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, LOCK_TIMEOUT):
+        try:
+            return _build(key, build_response)
+        finally:
+            cache.delete(lock)
+    # Запись уже пересчитывается другим запросом.
+    entry = entry or _wait_for(key)
+    if entry is not None:
+        return Response(entry['data'])
+    return _build(key, build_response)
+
+
+def cached_response(request, scopes, build_response, allowed=LIST_PARAMS):
+    # Флаг ставит api.prerender: файлу нужен ответ прямо из базы.
+    if getattr(request, 'bypass_response_cache', False):
+        return build_response()
+    key = _cache_key(request, scopes, allowed)
+    etag = make_etag(key)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _fetch(key, build_response)
+        if response.status_code != status.HTTP_200_OK:
+            return response
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Authorization',))
+    return response
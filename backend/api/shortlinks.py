@@ -0,0 +1,106 @@
+"""Короткие ссылки на рецепты.
+
+Код — это id рецепта в base62, поэтому ни при создании ссылки, ни при
+переходе по ней база не нужна. Переход /r/<code> обрабатывается
+обёрткой над WSGI/ASGI-приложением до Django: без маршрутизации,
+middleware, сессий и DRF.
+"""
+import string
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+DECODE = {char: value for value, char in enumerate(ALPHABET)}
+
+PREFIX = '/r/'
+# id рецепта помещается в bigint, это не больше 11 знаков base62.
+MAX_CODE_LENGTH = 11
+RECIPE_PATH = '/recipes/{}'
+CACHE_CONTROL = 'public, max-age=86400'
+
+
+def encode(number):
+    if number < 0:
+        raise ValueError('Код строится только для неотрицательных чисел.')
+    chars = []
+    while True:
+        number, remainder = divmod(number, BASE)
+        chars.append(ALPHABET[remainder])
+        if not number:
+            return ''.join(reversed(chars))
+
+
+def decode(code):
+    if not code or len(code) > MAX_CODE_LENGTH:
+        raise ValueError('Некорректный код ссылки.')
+    number = 0
+    for char in code:
+        try:
+            number = number * BASE + DECODE[char]
+        except KeyError:
+            raise ValueError('Некорректный код ссылки.') from None
+    return number
+
+
+def short_link(recipe_id):
+    from django.conf import settings
+
+    return settings.SHORT_LINK_BASE + encode(recipe_id)
+
+
+def resolve(path):
+    """Location для пути /r/<code> или None, если код некорректен.
+
+    Не кэшируется: разбор до 11 знаков дешевле поиска в кэше, а кэш по
+    пути клиента заполнялся бы произвольными строками.
+    """
+    code = path[len(PREFIX):].rstrip('/')
+    try:
+        recipe_id = decode(code)
+    except ValueError:
+        return None
+    # Ведущие нули дали бы несколько кодов на один рецепт.
+    if encode(recipe_id) != code:
+        return None
+    return RECIPE_PATH.format(recipe_id)
+
+
+def _headers(location):
+    if location is None:
+        return '404 Not Found', [('Content-Length', '0')]
+    return '301 Moved Permanently', [
+        ('Location', location),
+        ('Cache-Control', CACHE_CONTROL),
+        ('Content-Length', '0'),
+    ]
+
+
+class ShortLinkWSGI:
+    def __init__(self, application):
+        self.application = application
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(PREFIX):
+            return self.application(environ, start_response)
+        start_response(*_headers(resolve(path)))
+        return [b'']
+
+
+class ShortLinkASGI:
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get('path', '')
+        if scope['type'] != 'http' or not path.startswith(PREFIX):
+            return await self.application(scope, receive, send)
+        status, headers = _headers(resolve(path))
+        await send({
+            'type': 'http.response.start',
+            'status': int(status.split()[0]),
+            'headers': [
+                (name.lower().encode(), value.encode())
+                for name, value in headers
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,164 @@
+"""Инкрементальная синхронизация каталога по журналу ChangeLog.
+
+Клиент хранит seq последнего применённого изменения и запрашивает
+/api/sync/?since=<seq>. В ответе — изменения после него: для upsert
+текущие данные объекта в формате API, для delete только id (tombstone).
+Несколько изменений одного объекта в пределах страницы сворачиваются
+в последнее. Первая загрузка: запросить /api/sync/ без since, запомнить
+next, затем скачать каталог обычным API и дальше синхронизироваться
+с этого номера — повторное применение upsert безопасно.
+"""
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+
+from recipes.models import ChangeLog, Ingredient, Recipe, Tag
+from recipes.serializers import TagSerializer
+
+from .flat import flat_ingredient, flat_recipe, serialize_recipes
+
+SYNC_LIMIT = 500
+SYNC_MAX_LIMIT = 1000
+
+# Отметки (последний выданный seq, незавершённые транзакции), из которых
+# выбирается граница видимости на PostgreSQL.
+MARKS_KEY = 'sync:marks'
+VISIBLE_KEY = 'sync:visible'
+MAX_MARKS = 32
+
+
+def _parse_snapshot(snapshot):
+    """Номера транзакций, выполнявшихся в момент снимка."""
+    _, _, running = snapshot.split(':')
+    return frozenset(int(xid) for xid in running.split(',') if xid)
+
+
+def advance(marks, visible, issued, running):
+    """Добавляет отметку (issued, running) и сдвигает границу visible.
+
+    Отметка снимается, когда ни одна из её транзакций больше не
+    выполняется; граница становится не меньше её seq.
+    """
+    pending = []
+    for seq, xids in [*marks, (issued, running)]:
+        if seq > issued:
+            # Последовательность начата заново (восстановление из копии).
+            continue
+        if xids & running:
+            pending.append((seq, xids))
+        else:
+            visible = max(visible, seq)
+    return pending[-MAX_MARKS:], visible
+
+
+def _postgres_visible_seq():
+    """Граница, после которой не может появиться меньший seq.
+
+    seq выдаётся последовательностью при вставке, а видна запись
+    становится при фиксации, так что запись с меньшим seq может
+    зафиксироваться позже записи с большим. Поэтому сначала читается
+    последний выданный seq, затем снимок: всё, что выдано до чтения,
+    выдано транзакциям, которые к снимку либо завершились, либо есть
+    в его списке выполняющихся (xid назначается до seq, см. changelog).
+    Когда все они завершатся, записи до этого seq окончательны. Долгая
+    транзакция задерживает границу, но не приводит к пропуску записей.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT pg_sequence_last_value('
+            "pg_get_serial_sequence(%s, 'seq'))",
+            [ChangeLog._meta.db_table],
+        )
+        issued = cursor.fetchone()[0] or 0
+        cursor.execute('SELECT pg_current_snapshot()::text')
+        running = _parse_snapshot(cursor.fetchone()[0])
+    marks, visible = advance(
+        cache.get(MARKS_KEY, []), cache.get(VISIBLE_KEY, 0), issued, running
+    )
+    cache.set(MARKS_KEY, marks, None)
+    cache.set(VISIBLE_KEY, visible, None)
+    return visible
+
+
+def visible_seq():
+    if connection.vendor == 'postgresql':
+        return _postgres_visible_seq()
+    # SQLite пропускает одну пишущую транзакцию за раз: seq выдаются
+    # в порядке фиксации.
+    return ChangeLog.objects.aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def visible_changes():
+    """Записи журнала, после которых не может появиться меньший seq."""
+    return ChangeLog.objects.filter(seq__lte=visible_seq())
+
+
+def current_seq():
+    return visible_changes().aggregate(seq=Max('seq'))['seq'] or 0
+
+
+def _recipes(ids, request):
+    rows = Recipe.objects.filter(id__in=ids).values(*flat_recipe.columns)
+    return {item['id']: item for item in serialize_recipes(rows, request)}
+
+
+def _tags(ids, request):
+    return {
+        item['id']: item for item in
+        TagSerializer(Tag.objects.filter(id__in=ids), many=True).data
+    }
+
+
+def _ingredients(ids, request):
+    return {
+        item['id']: item for item in flat_ingredient.represent_many(
+            Ingredient.objects.filter(id__in=ids)
+            .values(*flat_ingredient.columns),
+            {'request': request},
+        )
+    }
+
+
+LOADERS = {
+    ChangeLog.RECIPE: _recipes,
+    ChangeLog.TAG: _tags,
+    ChangeLog.INGREDIENT: _ingredients,
+}
+
+
+def changes_after(since, limit, request):
+    entries = list(
+        visible_changes().filter(seq__gt=since).order_by('seq')
+        .values_list('seq', 'kind', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    latest = {}
+    for seq, kind, object_id, action in entries:
+        # Объект переезжает в конец: порядок ответа — по последнему seq.
+        latest.pop((kind, object_id), None)
+        latest[(kind, object_id)] = (seq, action)
+    upserts = defaultdict(list)
+    for (kind, object_id), (_, action) in latest.items():
+        if action == ChangeLog.UPSERT:
+            upserts[kind].append(object_id)
+    data = {
+        kind: LOADERS[kind](ids, request) for kind, ids in upserts.items()
+    }
+    changes = []
+    for (kind, object_id), (seq, action) in latest.items():
+        item = {'seq': seq, 'type': kind, 'id': object_id, 'action': action}
+        if action == ChangeLog.UPSERT:
+            payload = data[kind].get(object_id)
+            if payload is None:
+                # Объект уже удалён, tombstone придёт на следующих страницах.
+                continue
+            item['data'] = payload
+        changes.append(item)
+    return {
+        'changes': changes,
+        'next': entries[-1][0] if entries else since,
+        'has_more': has_more,
+    }
@@ -0,0 +1,179 @@
+"""Ограничение частоты запросов по алгоритму token bucket.
+
+Ведро с ёмкостью N пополняется со скоростью N за период из
+DEFAULT_THROTTLE_RATES ('N/период'); каждый запрос забирает жетон.
+Вёдра общие для всех воркеров и хранятся без обращения к базе:
+
+    mmap  — файл THROTTLE_MMAP_PATH, отображённый в память всех
+            процессов одного хоста: хэш-таблица фиксированного размера,
+            слот блокируется fcntl-блокировкой на время проверки;
+    cache — кэш Django (DJANGO_CACHE_*), общий и для нескольких хостов.
+
+Внутренние запросы (api.prerender.build_request) помечены
+bypass_throttling и не ограничиваются: у них нет адреса клиента, и все
+они делили бы одно ведро.
+"""
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# Слот: 64-битный хэш ключа, число жетонов, время последней проверки.
+SLOT = struct.Struct('=Qdd')
+# Ключ ищется в WAYS соседних слотах; при нехватке места вытесняется
+# ведро, к которому дольше всех не обращались.
+WAYS = 4
+
+
+def parse_rate(rate):
+    """'100/min' → (ёмкость ведра, жетонов в секунду)."""
+    number, period = rate.split('/')
+    capacity = int(number)
+    return capacity, capacity / DURATIONS[period[0]]
+
+
+def take(tokens, updated_at, now, capacity, rate):
+    """Пополняет ведро и забирает жетон; возвращает остаток и ожидание."""
+    tokens = min(capacity, tokens + max(now - updated_at, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MmapBucketStore:
+    def __init__(self, path, slots):
+        self.slots = slots
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = slots * SLOT.size
+        if os.fstat(self.fd).st_size < size:
+            os.ftruncate(self.fd, size)
+        self.map = mmap.mmap(self.fd, size)
+        # fcntl-блокировки разделяют процессы, но не потоки одного процесса.
+        self.lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little'
+        ) or 1
+        start = digest % (self.slots - WAYS + 1) * SLOT.size
+        length = WAYS * SLOT.size
+        with self.lock:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                offset, tokens, updated_at = self._find(
+                    digest, start, capacity, now
+                )
+                tokens, wait = take(tokens, updated_at, now, capacity, rate)
+                SLOT.pack_into(self.map, offset, digest, tokens, now)
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+        return wait
+
+    def _find(self, digest, start, capacity, now):
+        oldest = None
+        for offset in range(start, start + WAYS * SLOT.size, SLOT.size):
+            owner, tokens, updated_at = SLOT.unpack_from(self.map, offset)
+            if owner == digest:
+                return offset, tokens, updated_at
+            if oldest is None or updated_at < oldest[1]:
+                oldest = offset, updated_at
+        return oldest[0], capacity, now
+
+
+class CacheBucketStore:
+    """Вёдра в кэше Django.
+
+    Чтение и запись — две операции без блокировки, поэтому при
+    одновременных запросах одного клиента ведро может отдать лишний жетон.
+    """
+
+    def consume(self, key, capacity, rate, now):
+        key = f'throttle:{key}'
+        tokens, updated_at = cache.get(key, (capacity, now))
+        tokens, wait = take(tokens, updated_at, now, capacity, rate)
+        cache.set(key, (tokens, now), int(capacity / rate) + 1)
+        return wait
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    if settings.THROTTLE_STORE == 'cache':
+        name = 'cache'
+    else:
+        name = settings.THROTTLE_MMAP_PATH
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = (
+                CacheBucketStore() if name == 'cache'
+                else MmapBucketStore(name, settings.THROTTLE_MMAP_SLOTS)
+            )
+        return _stores[name]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    def get_scope(self, request, view):
+        raise NotImplementedError
+
+    def get_ident_key(self, request):
+        return f'ip:{self.get_ident(request)}'
+
+    def allow_request(self, request, view):
+        if getattr(request, 'bypass_throttling', False):
+            return True
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, per_second = parse_rate(rate)
+        self.delay = get_store().consume(
+            f'{scope}:{self.get_ident_key(request)}',
+            capacity,
+            per_second,
+            time.time(),
+        )
+        return not self.delay
+
+    def wait(self):
+        return self.delay
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Общий лимит адреса на все запросы."""
+
+    def get_scope(self, request, view):
+        return 'ip'
+
+
+class RouteThrottle(TokenBucketThrottle):
+    """Лимит пользователя (гостя — по адресу) на класс маршрута.
+
+    Класс — read или write по методу; представление может задать свой
+    для действия в словаре throttle_scopes (upload, download).
+    """
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+        if scope is not None:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return super().get_ident_key(request)
@@ -1,10 +1,13 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
     CustomUserViewSet,
+    EventTicketView,
     IngredientViewSet,
     RecipeViewSet,
+    SyncView,
     TagViewSet,
 )
 
@@ -16,5 +19,25 @@ router.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('sync/', SyncView.as_view(), name='sync'),
+    path(
+        'events/ticket/', EventTicketView.as_view(), name='events-ticket'
+    ),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.AUTH_MODE == 'jwt':
+    from .jwt_views import JWTTokenCreateView, JWTTokenDestroyView
+
+    urlpatterns = [
+        path(
+            'auth/token/login/',
+            JWTTokenCreateView.as_view(),
+            name='login',
+        ),
+        path(
+            'auth/token/logout/',
+            JWTTokenDestroyView.as_view(),
+            name='logout',
+        ),
+    ] + urlpatterns
@@ -1,18 +1,25 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (
     AllowAny,
+    IsAdminUser,
     IsAuthenticated,
     IsAuthenticatedOrReadOnly,
 )
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 
+from recipes.deletion import delete_recipes, delete_user
 from recipes.filters import IngredientFilter, RecipeFilter
 from recipes.models import (
     Ingredient,
@@ -20,6 +27,7 @@ from recipes.models import (
     RecipeIngredient,
     Tag,
 )
+from recipes.ranking import bump_recipe_scores
 from recipes.serializers import (
     IngredientSerializer,
     RecipeReadSerializer,
@@ -27,25 +35,71 @@ from recipes.serializers import (
     ShortRecipeSerializer,
     TagSerializer,
 )
-from users.models import Follow
+from recipes.discovery import MODES, UNIFORM, random_recipes
+from recipes.facets import FACETS, recipe_facets
+from recipes.similarity import similar_recipe_ids
+from users.graph import suggested_authors
 from users.serializers import (
     SubscriptionSerializer, UserSerializer, AvatarSerializer)
 
+from . import response_cache
+from .bulk import BulkIdsSerializer, bulk_link, bulk_unlink
+from .conditional import (
+    conditional_response,
+    recipe_detail_etag,
+    recipe_list_etag,
+)
+from .events import TICKET_TIMEOUT, following_changed, issue_ticket
+from .export import export_lines
+from .flat import (
+    flat_ingredient,
+    flat_recipe,
+    flat_short_recipe,
+    flat_user,
+    serialize_recipes,
+    serialize_users,
+)
+from .idempotency import idempotent
 from .permissions import IsAuthorOrReadOnly
+from .shortlinks import short_link
+from .sync import SYNC_LIMIT, SYNC_MAX_LIMIT, changes_after, current_seq
 
 User = get_user_model()
 
+# Удалённые рецепты видны через связи до фоновой очистки.
+RECIPES_COUNT = Count('recipes', filter=Q(recipes__deleted_at__isnull=True))
+
+SIMILAR_LIMIT = 6
+SIMILAR_MAX_LIMIT = 50
+RANDOM_LIMIT = 1
+RANDOM_MAX_LIMIT = 50
+SUGGESTIONS_LIMIT = 10
+SUGGESTIONS_MAX_LIMIT = 50
+
 
 class CustomUserViewSet(DjoserUserViewSet):
     permission_classes = (IsAuthenticated,)
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
+    throttle_scopes = {'avatar': 'upload'}
 
     def get_permissions(self):
         if self.action in ('list', 'retrieve'):
             return [AllowAny()]
         return super().get_permissions()
 
+    def perform_destroy(self, instance):
+        delete_user(instance)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            *flat_user.columns
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_users(page, request))
+        return Response(serialize_users(list(queryset), request))
+
     @action(
         detail=False,
         methods=['get'],
@@ -54,8 +108,8 @@ class CustomUserViewSet(DjoserUserViewSet):
     def subscriptions(self, request):
         authors = (
             User.objects
-            .filter(following__user=request.user)
-            .annotate(recipes_count=Count('recipes'))
+            .filter(following__user=request.user, deleted_at__isnull=True)
+            .annotate(recipes_count=RECIPES_COUNT)
         )
         page = self.paginate_queryset(authors)
         serializer = SubscriptionSerializer(
@@ -65,6 +119,33 @@ class CustomUserViewSet(DjoserUserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+    )
+    def suggestions(self, request):
+        try:
+            limit = int(request.query_params.get('limit', SUGGESTIONS_LIMIT))
+        except ValueError:
+            limit = SUGGESTIONS_LIMIT
+        limit = max(1, min(limit, SUGGESTIONS_MAX_LIMIT))
+        # Снимок графа может отставать: подписки сверяются с базой.
+        following = set(
+            request.user.follower.values_list('author_id', flat=True)
+        )
+        ids = [
+            pk for pk, _ in suggested_authors(request.user.id)
+            if pk not in following
+        ]
+        rows = {
+            row['id']: row for row in
+            self.get_queryset().filter(id__in=ids).values(*flat_user.columns)
+        }
+        return Response(serialize_users(
+            [rows[pk] for pk in ids if pk in rows][:limit], request
+        ))
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -81,19 +162,19 @@ class CustomUserViewSet(DjoserUserViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            follow, created = Follow.objects.get_or_create(
-                user=user,
-                author=author,
+            _, added = bulk_link(
+                user.follower, 'author', User.objects.all(), [author.id]
             )
-            if not created:
+            if not added:
                 return Response(
                     {'errors': 'Уже подписаны.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            following_changed(user, added=added)
 
             author = (
                 User.objects
-                .annotate(recipes_count=Count('recipes'))
+                .annotate(recipes_count=RECIPES_COUNT)
                 .get(id=author.id)
             )
             serializer = SubscriptionSerializer(
@@ -102,20 +183,47 @@ class CustomUserViewSet(DjoserUserViewSet):
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        deleted, _ = user.following.filter(author=author).delete()
-        if not deleted:
+        _, removed = bulk_unlink(user.follower, 'author', [author.id])
+        if not removed:
             return Response(
                 {'errors': 'Подписки не было.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        following_changed(user, removed=removed)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='subscribe',
+    )
+    def subscribe_bulk(self, request):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results, added = bulk_link(
+                request.user.follower,
+                'author',
+                self.get_queryset().exclude(id=request.user.id),
+                ids,
+            )
+            following_changed(request.user, added=added)
+        else:
+            results, removed = bulk_unlink(
+                request.user.follower, 'author', ids
+            )
+            following_changed(request.user, removed=removed)
+        return Response({'results': results})
+
     @action(
         detail=False,
         methods=['put', 'delete'],
         permission_classes=[IsAuthenticated],
         url_path='me/avatar',
     )
+    @idempotent
     def avatar(self, request):
         user = request.user
 
@@ -150,11 +258,25 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = ('name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(flat_ingredient.represent_many(
+            queryset.values(*flat_ingredient.columns),
+            {'request': request},
+        ))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     filterset_class = RecipeFilter
+    throttle_scopes = {
+        'create': 'upload',
+        'update': 'upload',
+        'partial_update': 'upload',
+        'download_shopping_cart': 'download',
+        'export': 'download',
+    }
 
     def get_serializer_class(self):
         if self.request.method in ('POST', 'PUT', 'PATCH'):
@@ -164,25 +286,139 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save()
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
+    # partial_update вызывает update, поэтому ключ проверяется и для PATCH.
+    @idempotent
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    def perform_destroy(self, instance):
+        delete_recipes(Recipe.objects.filter(pk=instance.pk))
+
+    def _untagged_queryset(self):
+        params = self.request.query_params.copy()
+        params.pop('tags', None)
+        return RecipeFilter(
+            params, queryset=self.get_queryset(), request=self.request
+        ).qs
+
+    def list(self, request, *args, **kwargs):
+        facets = [
+            name for name in
+            request.query_params.get('facets', '').split(',') if name
+        ]
+        if not set(facets) <= set(FACETS):
+            return Response(
+                {'facets': f'Доступны фасеты: {", ".join(FACETS)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        def build_response():
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = queryset.values(*flat_recipe.columns)
+            page = self.paginate_queryset(rows)
+            if page is not None:
+                response = self.get_paginated_response(
+                    serialize_recipes(page, request)
+                )
+            else:
+                response = Response(serialize_recipes(list(rows), request))
+            if facets:
+                response.data['facets'] = recipe_facets(
+                    facets, queryset, self._untagged_queryset()
+                )
+            return response
+
+        # Для гостей ответ зависит только от набора рецептов.
+        if not request.user.is_anonymous:
+            return build_response()
+        if response_cache.is_enabled():
+            return response_cache.cached_response(
+                request,
+                response_cache.list_scopes(request.query_params),
+                build_response,
+            )
+        return conditional_response(
+            request,
+            recipe_list_etag(
+                self.filter_queryset(self.get_queryset()),
+                request,
+                self.paginator,
+                # Фасет тегов зависит и от рецептов вне выбранных тегов.
+                self._untagged_queryset() if facets else None,
+            ),
+            build_response,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs['pk']
+
+        def build_response():
+            row = get_object_or_404(
+                self.filter_queryset(self.get_queryset())
+                .values(*flat_recipe.columns),
+                pk=pk,
+            )
+            return Response(serialize_recipes([row], request)[0])
+
+        if (
+            request.user.is_anonymous
+            and response_cache.is_enabled()
+            and pk.isdigit()
+        ):
+            return response_cache.cached_response(
+                request, ['all', f'recipe:{int(pk)}'], build_response, ()
+            )
+        etag = recipe_detail_etag(
+            self.filter_queryset(self.get_queryset()), pk, request.user
+        )
+        if etag is None:
+            raise Http404
+        return conditional_response(request, etag, build_response)
+
+    @transaction.atomic
     def _add_to(self, related_manager, recipe):
-        obj, created = related_manager.get_or_create(recipe=recipe)
-        if not created:
+        _, added = bulk_link(
+            related_manager, 'recipe', Recipe.objects.all(), [recipe.id]
+        )
+        if not added:
             return Response(
                 {'errors': 'Уже добавлено.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        bump_recipe_scores(added, 1)
         serializer = ShortRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def _remove_from(self, related_manager, recipe):
-        deleted, _ = related_manager.filter(recipe=recipe).delete()
-        if not deleted:
+        _, removed = bulk_unlink(related_manager, 'recipe', [recipe.id])
+        if not removed:
             return Response(
                 {'errors': 'Не было в списке.'},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        bump_recipe_scores(removed, -1)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def _bulk_change(self, request, related_manager):
+        serializer = BulkIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if request.method == 'POST':
+            results, added = bulk_link(
+                related_manager, 'recipe', Recipe.objects.all(), ids
+            )
+            bump_recipe_scores(added, 1)
+        else:
+            results, removed = bulk_unlink(related_manager, 'recipe', ids)
+            bump_recipe_scores(removed, -1)
+        return Response({'results': results})
+
     @action(
         detail=True,
         methods=['post', 'delete'],
@@ -205,6 +441,105 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self._add_to(request.user.shopping_cart, recipe)
         return self._remove_from(request.user.shopping_cart, recipe)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='favorite',
+    )
+    def favorite_bulk(self, request):
+        return self._bulk_change(request, request.user.favorites)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        permission_classes=[IsAuthenticated],
+        url_path='shopping_cart',
+    )
+    def shopping_cart_bulk(self, request):
+        return self._bulk_change(request, request.user.shopping_cart)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[AllowAny],
+    )
+    def similar(self, request, pk=None):
+        recipe = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', SIMILAR_LIMIT))
+        except ValueError:
+            limit = SIMILAR_LIMIT
+        limit = max(1, min(limit, SIMILAR_MAX_LIMIT))
+        ids = similar_recipe_ids(recipe, limit)
+        rows = {
+            row['id']: row for row in
+            Recipe.objects.filter(id__in=ids)
+            .values(*flat_short_recipe.columns)
+        }
+        return Response(flat_short_recipe.represent_many(
+            [rows[pk] for pk in ids if pk in rows],
+            {'request': request},
+        ))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[AllowAny],
+    )
+    def random(self, request):
+        mode = request.query_params.get('mode', UNIFORM)
+        if mode not in MODES:
+            return Response(
+                {'mode': f'Ожидается одно из: {", ".join(MODES)}.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            count = int(request.query_params.get('n', RANDOM_LIMIT))
+        except ValueError:
+            count = RANDOM_LIMIT
+        count = max(1, min(count, RANDOM_MAX_LIMIT))
+        rows = random_recipes(
+            Recipe.objects.values(*flat_recipe.columns),
+            request.query_params.getlist('tags'),
+            count,
+            mode,
+        )
+        return Response(serialize_recipes(rows, request))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAdminUser],
+    )
+    def export(self, request):
+        try:
+            after = int(request.query_params.get('after', 0))
+        except ValueError:
+            return Response(
+                {'after': 'Ожидается id рецепта.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        lines = (line.encode() for line in export_lines(request, after))
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = StreamingHttpResponse(compress_sequence(lines))
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = StreamingHttpResponse(lines)
+        response['Content-Type'] = 'application/x-ndjson; charset=utf-8'
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    @action(
+        detail=True,
+        methods=['get'],
+        permission_classes=[AllowAny],
+        url_path='get-link',
+    )
+    def get_link(self, request, pk=None):
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        return Response({'short-link': short_link(recipe.id)})
+
     @action(
         detail=False,
         methods=['get'],
@@ -214,7 +549,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         ingredients = (
             RecipeIngredient.objects
-            .filter(recipe__in_carts__user=request.user)
+            .filter(
+                recipe__in_carts__user=request.user,
+                recipe__deleted_at__isnull=True,
+            )
             .values(
                 'ingredient__name',
                 'ingredient__measurement_unit',
@@ -242,3 +580,47 @@ class RecipeViewSet(viewsets.ModelViewSet):
             'attachment; filename="shopping_list.txt"'
         )
         return response
+
+
+class SyncView(APIView):
+    """Изменения каталога после номера since (см. api.sync)."""
+
+    permission_classes = (AllowAny,)
+    # Избранное и корзина журналом не отслеживаются, поэтому данные
+    # одинаковы для всех и отдаются как гостю.
+    authentication_classes = ()
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            return Response(
+                {'changes': [], 'next': current_seq(), 'has_more': False}
+            )
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        if since < 0:
+            return Response(
+                {'since': 'Ожидается номер изменения.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            limit = int(request.query_params.get('limit', SYNC_LIMIT))
+        except ValueError:
+            limit = SYNC_LIMIT
+        limit = max(1, min(limit, SYNC_MAX_LIMIT))
+        return Response(changes_after(since, limit, request))
+
+
+class EventTicketView(APIView):
+    """Билет для потока /api/events/ (см. api.events)."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        return Response(
+            {'ticket': issue_ticket(request.user),
+             'expires_in': TICKET_TIMEOUT},
+            status=status.HTTP_201_CREATED,
+        )
@@ -2,6 +2,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from api.shortlinks import ShortLinkASGI
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from api.events import EventStreamASGI  # noqa: E402
+
+application = ShortLinkASGI(EventStreamASGI(django_application))
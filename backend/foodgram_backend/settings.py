@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -14,12 +15,15 @@ DEBUG = os.getenv('DJANGO_DEBUG', 'False').lower() == 'true'
 ALLOWED_HOSTS = os.getenv('DJANGO_ALLOWED_HOSTS', '').split()
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # Модули admin.py приложений загружаются из urls.py, а не при
+    # django.setup(): воркеру очереди и командам админка не нужна.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework.authtoken',
@@ -29,6 +33,7 @@ INSTALLED_APPS = [
     'users',
     'recipes',
     'api',
+    'jobs',
 ]
 
 AUTH_USER_MODEL = 'users.User'
@@ -110,6 +115,31 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'DJANGO_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
+# LocMem и Dummy видны только своему процессу. Счётчикам поколений
+# (кэш ответов гостям) и списку отозванных JWT нужен кэш, общий для
+# всех воркеров и контейнеров, например Redis.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+SHARED_CACHE = CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+# token — токены DRF в таблице authtoken_token;
+# jwt — подписанные токены без обращения к базе на каждый запрос.
+# Режим jwt требует общего кэша (DJANGO_CACHE_*): через него
+# синхронизируются отозванные токены и отключённые пользователи.
+AUTH_MODE = os.getenv('AUTH_MODE', 'token').lower()
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
@@ -123,6 +153,48 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'api.pagination.LimitPageNumberPagination',
     'PAGE_SIZE': 6,
+    # Лимиты token bucket (api.throttling): ip — все запросы адреса,
+    # остальные — на пользователя (гостя — на адрес) по классу маршрута.
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.IPThrottle',
+        'api.throttling.RouteThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'ip': os.getenv('THROTTLE_IP_RATE', '600/min'),
+        'read': os.getenv('THROTTLE_READ_RATE', '300/min'),
+        'write': os.getenv('THROTTLE_WRITE_RATE', '60/min'),
+        'upload': os.getenv('THROTTLE_UPLOAD_RATE', '10/min'),
+        'download': os.getenv('THROTTLE_DOWNLOAD_RATE', '10/min'),
+    },
+    # Адрес клиента — из X-Forwarded-For, который выставляет nginx.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+}
+
+if AUTH_MODE == 'jwt':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'] = [
+        'api.authentication.StatelessJWTAuthentication',
+    ]
+
+# Хранилище вёдер: mmap — файл, общий для воркеров одного хоста;
+# cache — кэш Django (нужен общий кэш, см. DJANGO_CACHE_*).
+THROTTLE_STORE = os.getenv('THROTTLE_STORE', 'mmap')
+THROTTLE_MMAP_PATH = os.getenv(
+    'THROTTLE_MMAP_PATH', '/tmp/foodgram-throttle.bin'
+)
+THROTTLE_MMAP_SLOTS = int(os.getenv('THROTTLE_MMAP_SLOTS', 65536))
+
+# Сколько секунд хранится ответ на запрос с Idempotency-Key
+# (api.idempotency; устаревшие удаляет manage.py clear_idempotency_keys).
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_LIFETIME_MINUTES', 60))
+    ),
+    # Фронтенд отправляет заголовок «Authorization: Token <...>».
+    'AUTH_HEADER_TYPES': ('Token', 'Bearer'),
+    'SIGNING_KEY': SECRET_KEY,
+    'UPDATE_LAST_LOGIN': False,
 }
 
 DJOSER = {
@@ -139,6 +211,57 @@ DJOSER = {
     },
 }
 
+# Поиск ингредиентов: размер выдачи и время жизни in-process индекса
+# (используется, когда база не PostgreSQL).
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+
+# Время жизни in-process индекса для /api/recipes/random/, секунды.
+RANDOM_INDEX_TTL = int(os.getenv('RANDOM_INDEX_TTL', 300))
+
+# Устаревший in-process индекс перестраивается в фоновом потоке, пока
+# запросы получают прежний (recipes.indexes).
+REBUILD_INDEXES_IN_BACKGROUND = True
+
+# Снимок графа подписок для /api/users/suggestions/ (users.graph):
+# файл, общий для воркеров одного хоста, и период его перестроения.
+FOLLOW_GRAPH_PATH = os.getenv(
+    'FOLLOW_GRAPH_PATH', '/tmp/foodgram-follow-graph.bin'
+)
+FOLLOW_GRAPH_TTL = int(os.getenv('FOLLOW_GRAPH_TTL', 600))
+
+# Период полураспада рейтинга «в трендах» (см. update_recipe_scores).
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 24))
+
+# Кэш ответов гостям (список и карточка рецепта), секунды; 0 — выключен.
+# Работает только с общим кэшем: без него изменение в одном воркере не
+# инвалидирует ответы остальных.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv(
+    'RESPONSE_CACHE_TIMEOUT', 60 if SHARED_CACHE else 0
+))
+
+# Готовые ответы для nginx (manage.py prerender); пусто — выключено.
+# С PRERENDER_ROOT нужен и внешний адрес сайта PRERENDER_BASE_URL:
+# от него строятся ссылки next/previous и на картинки.
+PRERENDER_ROOT = os.getenv('PRERENDER_ROOT', '')
+PRERENDER_BASE_URL = os.getenv('PRERENDER_BASE_URL', 'http://localhost')
+PRERENDER_LIST_PAGES = int(os.getenv('PRERENDER_LIST_PAGES', 3))
+PRERENDER_TOP_RECIPES = int(os.getenv('PRERENDER_TOP_RECIPES', 100))
+
+# Профилирование памяти (api.memory, manage.py memory_report): каталог
+# для статистики воркеров; пусто — выключено. Замедляет каждый запрос.
+MEMORY_PROFILING_DIR = os.getenv('MEMORY_PROFILING_DIR', '')
+MEMORY_PROFILING_EVERY = int(os.getenv('MEMORY_PROFILING_EVERY', 100))
+MEMORY_PROFILING_FRAMES = int(os.getenv('MEMORY_PROFILING_FRAMES', 1))
+
+if MEMORY_PROFILING_DIR:
+    MIDDLEWARE.insert(0, 'api.memory.MemoryProfileMiddleware')
+
+# Рассылка событий /api/events/ между процессами (см. api.events):
+# api.events.LocalBackend — один процесс, api.events.PostgresBackend —
+# через LISTEN/NOTIFY.
+EVENTS_BACKEND = os.getenv('EVENTS_BACKEND', 'api.events.LocalBackend')
+
 SHORT_LINK_BASE = os.getenv('SHORT_LINK_BASE', 'http://localhost/r/')
 CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', '').split()
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+# Тесты по умолчанию идут на SQLite; USE_SQLITE=false — на PostgreSQL.
+os.environ.setdefault('USE_SQLITE', 'true')
+
+from .settings import *  # noqa: E402,F401,F403
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+RESPONSE_CACHE_TIMEOUT = 0
+
+RANDOM_INDEX_TTL = 0
+
+# Фоновый поток не видит данные из незафиксированной транзакции теста.
+REBUILD_INDEXES_IN_BACKGROUND = False
+
+# Снимок графа подписок тесты перестраивают сами.
+FOLLOW_GRAPH_PATH = os.path.join(
+    tempfile.gettempdir(), f'foodgram-follow-graph-{os.getpid()}.bin'
+)
+FOLLOW_GRAPH_TTL = 3600
+
+# Свой файл вёдер на каждый прогон и лимиты, которые тесты не выберут.
+THROTTLE_MMAP_PATH = os.path.join(
+    tempfile.gettempdir(), f'foodgram-throttle-{os.getpid()}.bin'
+)
+THROTTLE_MMAP_SLOTS = 1024
+REST_FRAMEWORK = {  # noqa: F405
+    **REST_FRAMEWORK,  # noqa: F405
+    'DEFAULT_THROTTLE_RATES': dict.fromkeys(
+        REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], '100000/min'  # noqa: F405
+    ),
+}
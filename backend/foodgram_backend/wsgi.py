@@ -1,7 +1,14 @@
 import os
 
 from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+
+from api.shortlinks import ShortLinkWSGI
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram_backend.settings')
 
-application = get_wsgi_application()
+application = ShortLinkWSGI(get_wsgi_application())
+
+# URLconf со всеми представлениями загружается при старте, а не на первом
+# запросе; с gunicorn --preload это происходит один раз в мастере.
+get_resolver().url_patterns
@@ -0,0 +1,68 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.queue import claim, execute
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background jobs from the database queue; tasks are the ones '
+        'registered while apps load (modules imported in AppConfig.ready)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Exit once there are no jobs ready to run',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        handlers = {
+            signum: signal.signal(signum, lambda *_: self.stopping.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        threads = [
+            threading.Thread(
+                target=self.work,
+                args=(f'{name}:{number}', options),
+            )
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS('Worker stopped'))
+
+    def work(self, worker, options):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                jobs = claim(worker)
+                if not jobs:
+                    if options['burst']:
+                        return
+                    self.stopping.wait(options['interval'])
+                    continue
+                for job in jobs:
+                    status = 'done' if execute(job) else 'failed'
+                    self.stdout.write(f'{worker} {job} {status}')
+        finally:
+            connection.close()
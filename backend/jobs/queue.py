@@ -0,0 +1,163 @@
+"""Очередь фоновых задач в таблице Job.
+
+Задача объявляется декоратором @task, ставится в очередь через
+defer() после фиксации транзакции и выполняется командой
+manage.py run_worker. На PostgreSQL задачи разбираются через
+SELECT ... FOR UPDATE SKIP LOCKED, на остальных базах — условным
+UPDATE по статусу, так что одну задачу берёт ровно один обработчик.
+Модуль с задачами импортируется в AppConfig.ready своего приложения:
+обработчик знает только задачи, зарегистрированные при загрузке.
+"""
+import random
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+# Задача «выполняется» дольше аренды — обработчик считается упавшим.
+# Пока задача работает, обработчик продлевает аренду каждые HEARTBEAT,
+# так что длинные задачи не забираются повторно.
+LEASE = timedelta(minutes=5)
+HEARTBEAT = LEASE / 3
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+
+registry = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def schedule(self, run_at, *args, **kwargs):
+        """Ставит задачу в очередь сразу, без ожидания транзакции."""
+        return Job.objects.create(
+            name=self.name,
+            payload={'args': list(args), 'kwargs': kwargs},
+            run_at=run_at,
+            max_attempts=self.max_attempts,
+        )
+
+    def defer(self, *args, delay=None, **kwargs):
+        """Ставит задачу в очередь после фиксации текущей транзакции."""
+        def enqueue():
+            run_at = timezone.now()
+            if delay is not None:
+                run_at += timedelta(seconds=delay)
+            self.schedule(run_at, *args, **kwargs)
+
+        transaction.on_commit(enqueue)
+
+
+def task(func=None, *, name=None, max_attempts=5):
+    """Регистрирует функцию как фоновую задачу.
+
+    Аргументы задачи сохраняются в JSON, поэтому передавать нужно id,
+    а не объекты моделей.
+    """
+    def register(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = Task(func, task_name, max_attempts)
+        return registry[task_name]
+
+    return register(func) if func is not None else register
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+
+def _claimable(now):
+    return Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_at__lt=now - LEASE)
+    )
+
+
+def _mark_running(queryset, worker, now):
+    return queryset.update(
+        status=Job.RUNNING,
+        locked_by=worker,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+
+
+def claim(worker, limit=1):
+    """Забирает до limit готовых к запуску задач для обработчика."""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _claimable(now).select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:limit]
+            )
+            _mark_running(Job.objects.filter(id__in=ids), worker, now)
+    else:
+        ids = [
+            pk for pk in _claimable(now).values_list('id', flat=True)[:limit]
+            if _mark_running(_claimable(now).filter(id=pk), worker, now)
+        ]
+    return list(Job.objects.filter(id__in=ids))
+
+
+@contextmanager
+def _lease_renewed(job):
+    stopped = threading.Event()
+
+    def renew():
+        try:
+            while not stopped.wait(HEARTBEAT.total_seconds()):
+                Job.objects.filter(
+                    pk=job.pk, status=Job.RUNNING, locked_by=job.locked_by
+                ).update(locked_at=timezone.now())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=renew, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def execute(job):
+    """Выполняет задачу; True — успешно, задача удалена из очереди."""
+    try:
+        current = registry.get(job.name)
+        if current is None:
+            raise LookupError(f'Задача {job.name} не зарегистрирована')
+        with _lease_renewed(job):
+            current.func(*job.payload['args'], **job.payload['kwargs'])
+    except Exception:
+        job.last_error = traceback.format_exc()
+        job.locked_by = ''
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+        job.save(update_fields=[
+            'status', 'run_at', 'locked_by', 'locked_at', 'last_error'
+        ])
+        return False
+    job.delete()
+    return True
@@ -1,15 +1,107 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.contrib.auth import get_user_model
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, OuterRef, Subquery
+from django.utils.functional import cached_property
 
+from .deletion import delete_recipes
 from .models import (
     Favorite, Ingredient, Recipe, RecipeIngredient,
     ShoppingCart, Tag,
 )
 
+User = get_user_model()
+
+RECENT_AUTHORS = 10
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор без точного COUNT(*) по всей таблице.
+
+    Для списка без фильтров на PostgreSQL берётся оценка из pg_class,
+    иначе строки считаются не дальше count_limit.
+    """
+
+    count_limit = 10_000
+
+    def _estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if queryset.query.where or connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class '
+                'WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > self.count_limit else None
+
+    @cached_property
+    def count(self):
+        estimate = self._estimate()
+        if estimate is not None:
+            return estimate
+        return self.object_list.order_by()[:self.count_limit + 1].count()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class BackgroundDeleteMixin:
+    """Удаление через пометку и фоновую очистку (см. recipes.deletion).
+
+    Страница подтверждения не перечисляет зависимые объекты: их сбор —
+    тот самый обход каскада, которого удаление в фоне избегает.
+    """
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        return (
+            [str(obj) for obj in objs],
+            {self.opts.verbose_name_plural: len(objs)},
+            set(),
+            [],
+        )
+
+
+class AuthorFilter(admin.SimpleListFilter):
+    """Вместо всех пользователей — выбранный автор и авторы свежих рецептов.
+
+    Остальных авторов удобнее искать через поиск по имени.
+    """
+
+    title = 'Автор'
+    parameter_name = 'author'
+
+    def _selected(self):
+        value = self.value()
+        return int(value) if value and value.isdigit() else None
+
+    def lookups(self, request, model_admin):
+        recent = Recipe.objects.values_list('author_id', flat=True)[
+            :RECENT_AUTHORS
+        ]
+        ids = {*recent, self._selected()} - {None}
+        return [
+            (str(user.pk), str(user))
+            for user in User.objects.filter(pk__in=ids).order_by('username')
+        ]
+
+    def queryset(self, request, queryset):
+        if self._selected() is not None:
+            return queryset.filter(author_id=self._selected())
+        return queryset
+
 
 class RecipeIngredientInline(admin.TabularInline):
     model = RecipeIngredient
     extra = 1
+    autocomplete_fields = ('ingredient',)
 
 
 @admin.register(Tag)
@@ -25,26 +117,47 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(BackgroundDeleteMixin, LargeTableAdmin):
     list_display = ('id', 'name', 'author', 'favorites_count')
-    list_filter = ('author', 'tags')
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author',)
     search_fields = ('name', 'author__username')
+    autocomplete_fields = ('author', 'tags')
     inlines = (RecipeIngredientInline,)
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.annotate(_favorites_count=Count('favorite_for'))
+        # Подзапрос считается только для строк текущей страницы.
+        return qs.annotate(_favorites_count=Subquery(
+            Favorite.objects.filter(recipe=OuterRef('pk'))
+            .order_by().values('recipe')
+            .annotate(total=Count('id')).values('total')
+        ))
 
     @admin.display(description='В избранном')
     def favorites_count(self, obj):
-        return obj._favorites_count
+        return obj._favorites_count or 0
+
+    def delete_model(self, request, obj):
+        delete_recipes(Recipe.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_recipes(queryset)
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username', 'recipe__name')
+    autocomplete_fields = ('user', 'recipe')
+    ordering = ('-id',)
@@ -0,0 +1,70 @@
+"""Запись изменений каталога в ChangeLog.
+
+Строки журнала пишутся в той же транзакции, что и сами изменения,
+поэтому откат не оставляет в журнале лишних записей. Рецепт содержит
+теги, ингредиенты и профиль автора, поэтому их изменение записывается
+и как изменение всех затронутых рецептов (с новым updated_at, от
+которого зависят ETag); для профиля, у которого рецептов может быть
+много, это делает фоновая задача.
+"""
+import itertools
+
+from django.db import connection
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .models import ChangeLog, Recipe
+
+BATCH_SIZE = 1000
+
+
+def _assign_xid():
+    # Граница видимости в api.sync опирается на то, что у транзакции
+    # уже есть xid, когда последовательность выдаёт ей seq.
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_current_xact_id()')
+
+
+def record(kind, object_id, action=ChangeLog.UPSERT):
+    _assign_xid()
+    ChangeLog.objects.create(kind=kind, object_id=object_id, action=action)
+
+
+def record_recipes(queryset, action=ChangeLog.UPSERT):
+    """Отмечает изменёнными (или удалёнными) рецепты из queryset."""
+    now = timezone.now()
+    ids = (
+        queryset.order_by().values_list('id', flat=True)
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    while batch := list(itertools.islice(ids, BATCH_SIZE)):
+        _assign_xid()
+        ChangeLog.objects.bulk_create(
+            ChangeLog(
+                kind=ChangeLog.RECIPE,
+                object_id=pk,
+                action=action,
+            )
+            for pk in batch
+        )
+        Recipe.all_objects.filter(pk__in=batch).update(updated_at=now)
+
+
+def record_recipes_with(**lookup):
+    record_recipes(Recipe.objects.filter(**lookup).distinct())
+
+
+@task
+def record_author_recipes(author_id):
+    record_recipes_with(author_id=author_id)
+
+
+def record_author_changed(author_id):
+    """Отмечает изменёнными рецепты автора в фоне.
+
+    Задача ставится в той же транзакции, что и изменение профиля, так
+    что без записи в журнал оно не зафиксируется.
+    """
+    record_author_recipes.schedule(timezone.now(), author_id)
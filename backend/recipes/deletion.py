@@ -0,0 +1,161 @@
+"""Удаление рецептов и пользователей с большим числом зависимых строк.
+
+Каскадное удаление Django собирает все зависимые объекты в памяти и
+удаляет их одной транзакцией: у популярного рецепта это тысячи строк
+избранного и корзин, у активного автора — ещё и все его рецепты.
+Поэтому объект сначала помечается удалённым (deleted_at) и сразу
+пропадает из API, а строки удаляет фоновая задача пачками по
+BATCH_SIZE. Каждая пачка — отдельный DELETE по списку id, без сбора
+объектов в Python и без сигналов, так что блокировки держатся недолго,
+сколько бы строк ни зависело от объекта. Журнал изменений и счётчики
+поколений обновляются при пометке, сигналы удаления при очистке
+не нужны. Избранное и корзины уменьшают popularity и trending_score
+своих рецептов в той же транзакции, что и удаление пачки.
+"""
+import itertools
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.utils import timezone
+
+from jobs.queue import task
+from users.state import set_user_active
+
+from . import changelog
+from .generations import bump_generations, recipe_scopes
+from .models import ChangeLog, Favorite, Recipe, ShoppingCart
+from .ranking import bump_recipe_scores
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+
+# Строки этих моделей учтены в счётчиках рецептов (см. ranking).
+SCORED_MODELS = (Favorite, ShoppingCart)
+
+
+def _dependents(model, ids):
+    """Строки, которые ссылаются на строки model с id из ids каскадом."""
+    for field in model._meta.many_to_many:
+        through = field.remote_field.through
+        if through._meta.auto_created:
+            yield through._base_manager.filter(
+                **{f'{field.m2m_field_name()}__in': ids}
+            )
+    for relation in model._meta.related_objects:
+        if relation.many_to_many:
+            # Промежуточные модели, объявленные явно, попадают сюда же
+            # как обратные внешние ключи.
+            if relation.through._meta.auto_created:
+                yield relation.through._base_manager.filter(
+                    **{f'{relation.field.m2m_reverse_field_name()}__in': ids}
+                )
+        elif relation.on_delete is models.CASCADE:
+            # Прочие варианты on_delete в схеме не встречаются; если
+            # появятся, удаление остановит ограничение внешнего ключа.
+            yield relation.related_model._base_manager.filter(
+                **{f'{relation.field.name}__in': ids}
+            )
+
+
+def _unscore(model, ids):
+    counts = Counter(
+        # Счётчики удалённых рецептов уже никто не прочтёт.
+        model._base_manager.filter(
+            pk__in=ids, recipe__deleted_at__isnull=True
+        ).values_list('recipe_id', flat=True)
+    )
+    by_count = {}
+    for recipe_id, count in counts.items():
+        by_count.setdefault(count, []).append(recipe_id)
+    for count, recipe_ids in by_count.items():
+        bump_recipe_scores(recipe_ids, -count)
+
+
+def purge(queryset, batch_size=BATCH_SIZE):
+    """Удаляет строки queryset и всё, что зависит от них каскадом.
+
+    Строки берутся пачками по id: для каждой пачки сначала так же
+    удаляются зависимые строки, затем она сама. Прерванную очистку
+    можно просто запустить заново.
+    """
+    model = queryset.model
+    pending = queryset.order_by('pk').values_list('pk', flat=True)
+    while batch := list(pending[:batch_size]):
+        for dependents in _dependents(model, batch):
+            purge(dependents, batch_size)
+        with transaction.atomic(using=queryset.db):
+            if model in SCORED_MODELS:
+                _unscore(model, batch)
+            model._base_manager.filter(pk__in=batch)._raw_delete(
+                queryset.db
+            )
+
+
+def hide_recipes(queryset):
+    """Помечает рецепты удалёнными и возвращает их id.
+
+    В журнал изменений пишутся удаления, счётчики поколений
+    увеличиваются так же, как при обычном удалении рецепта.
+    """
+    rows = list(queryset.values_list('id', 'author_id'))
+    ids = [pk for pk, _ in rows]
+    if not ids:
+        return ids
+    slugs = set(
+        Recipe.tags.through.objects.filter(recipe_id__in=ids)
+        .values_list('tag__slug', flat=True)
+    )
+    changelog.record_recipes(
+        Recipe.objects.filter(pk__in=ids), ChangeLog.DELETE
+    )
+    Recipe.objects.filter(pk__in=ids).update(deleted_at=timezone.now())
+    bump_generations(
+        *itertools.chain.from_iterable(
+            recipe_scopes(pk, author_id) for pk, author_id in rows
+        ),
+        *(f'tag:{slug}' for slug in slugs),
+    )
+    return ids
+
+
+@task
+def purge_recipes(recipe_ids):
+    purge(Recipe.all_objects.filter(
+        pk__in=recipe_ids, deleted_at__isnull=False
+    ))
+
+
+def delete_recipes(queryset):
+    """Удаление рецептов из API и админки: пометка сейчас, строки — в фоне."""
+    with transaction.atomic():
+        ids = hide_recipes(queryset)
+        if ids:
+            purge_recipes.defer(ids)
+
+
+@task
+def purge_user(user_id):
+    # Рецепты прячутся пачками до удаления строк, чтобы в журнал
+    # изменений и счётчики поколений попали все.
+    recipes = Recipe.objects.filter(author_id=user_id).order_by('pk')
+    while True:
+        with transaction.atomic():
+            if not hide_recipes(recipes[:BATCH_SIZE]):
+                break
+    purge(User.objects.filter(pk=user_id, deleted_at__isnull=False))
+
+
+def delete_user(user):
+    """Пользователь сразу теряет доступ и пропадает из выдачи.
+
+    Его рецепты, подписки, избранное и корзина удаляются в фоне.
+    """
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(
+            is_active=False, deleted_at=timezone.now()
+        )
+        set_user_active(user.pk, False)
+        bump_generations('all')
+        purge_user.defer(user.pk)
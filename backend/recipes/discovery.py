@@ -0,0 +1,138 @@
+"""Случайные рецепты без ORDER BY RANDOM().
+
+RecipeSampleIndex держит в памяти процесса отсортированный массив id
+рецептов и массивы id по каждому тегу. Выборка K рецептов — K случайных
+позиций в массиве, а не сортировка всей таблицы. Для выборки с учётом
+популярности строятся префиксные суммы весов (popularity + 1), позиция
+ищется бинарным поиском. Массивы для набора тегов объединяются один раз
+и кэшируются до перестроения индекса (раз в RANDOM_INDEX_TTL секунд, в
+фоне — см. indexes), поэтому новые рецепты попадают в выборку с этой
+задержкой.
+"""
+import bisect
+import heapq
+import itertools
+import random
+import threading
+from array import array
+from collections import defaultdict
+
+from .indexes import BackgroundIndex
+from .models import Recipe
+
+UNIFORM = 'uniform'
+POPULAR = 'popular'
+MODES = (UNIFORM, POPULAR)
+
+# Столько попыток на рецепт даётся выборке с весами, прежде чем она
+# остановится на неповторяющихся, найденных к этому моменту.
+WEIGHTED_ATTEMPTS = 4
+
+
+class RecipeSampleIndex:
+    def __init__(self, recipe_rows, tag_rows):
+        self.ids = array('q')
+        self.weights = array('d')
+        for pk, popularity in recipe_rows:
+            self.ids.append(pk)
+            self.weights.append(popularity + 1)
+        by_tag = defaultdict(lambda: array('q'))
+        for recipe_id, slug in tag_rows:
+            by_tag[slug].append(recipe_id)
+        self.by_tag = dict(by_tag)
+        self._selections = {}
+        self._lock = threading.Lock()
+
+    def _selection(self, slugs):
+        """id рецептов с любым из тегов и префиксные суммы их весов."""
+        key = frozenset(slug for slug in slugs if slug in self.by_tag)
+        if slugs and not key:
+            return array('q'), array('d')
+        with self._lock:
+            if key in self._selections:
+                return self._selections[key]
+        if not key:
+            ids = self.ids
+            weights = self.weights
+        else:
+            ids = array('q', (
+                pk for pk, _ in itertools.groupby(heapq.merge(
+                    *(self.by_tag[slug] for slug in key)
+                ))
+            ))
+            weights = array('d')
+            selected = array('q')
+            for pk in ids:
+                position = bisect.bisect_left(self.ids, pk)
+                # Связь могла появиться между чтением рецептов и тегов.
+                if position < len(self.ids) and self.ids[position] == pk:
+                    selected.append(pk)
+                    weights.append(self.weights[position])
+            ids = selected
+        selection = ids, array('d', itertools.accumulate(weights))
+        with self._lock:
+            self._selections[key] = selection
+        return selection
+
+    def sample(self, slugs, count, mode=UNIFORM, exclude=()):
+        ids, cumulative = self._selection(slugs)
+        if mode == POPULAR and ids:
+            total = cumulative[-1]
+            chosen = {}
+            for _ in range(count * WEIGHTED_ATTEMPTS):
+                if len(chosen) == count:
+                    break
+                pk = ids[bisect.bisect_right(
+                    cumulative, random.random() * total
+                )]
+                if pk not in exclude:
+                    chosen[pk] = None
+            return list(chosen)
+        positions = random.sample(
+            range(len(ids)), min(count + len(exclude), len(ids))
+        )
+        return [
+            ids[position] for position in positions
+            if ids[position] not in exclude
+        ][:count]
+
+
+def build_sample_index():
+    return RecipeSampleIndex(
+        Recipe.objects.order_by('id')
+        .values_list('id', 'popularity')
+        .iterator(chunk_size=10_000),
+        Recipe.tags.through.objects
+        .filter(recipe__deleted_at__isnull=True)
+        .order_by('recipe_id')
+        .values_list('recipe_id', 'tag__slug')
+        .iterator(chunk_size=10_000),
+    )
+
+
+sample_index = BackgroundIndex(build_sample_index, 'RANDOM_INDEX_TTL')
+
+
+def get_sample_index():
+    return sample_index.get()
+
+
+def random_recipes(rows, slugs, count, mode=UNIFORM, attempts=3):
+    """До count строк rows для случайных рецептов с любым из тегов slugs.
+
+    Рецепты, удалённые после построения индекса, отбрасываются, и
+    недостающие добираются повторной выборкой.
+    """
+    index = get_sample_index()
+    found = {}
+    seen = set()
+    for _ in range(attempts):
+        candidates = index.sample(slugs, count - len(found), mode, seen)
+        if not candidates:
+            break
+        seen.update(candidates)
+        by_id = {row['id']: row for row in rows.filter(id__in=candidates)}
+        found.update((pk, by_id[pk]) for pk in candidates if pk in by_id)
+        if len(found) >= count:
+            break
+    return list(found.values())
@@ -0,0 +1,99 @@
+"""Счётчики фасетов для списка рецептов.
+
+Фасеты считаются одним запросом, сколько бы ни было тегов или
+интервалов: если нужны оба, интервалы времени приготовления идут
+скалярными подзапросами в запросе счётчиков тегов. Фасет тегов
+считается без фильтра по тегам: теги объединяются по ИЛИ, и счётчик
+показывает, сколько рецептов даст выбор этого тега.
+"""
+from django.db.models import Count, Func, IntegerField, Q, Subquery
+
+from .models import Tag
+
+TAGS = 'tags'
+COOKING_TIME = 'cooking_time'
+FACETS = (TAGS, COOKING_TIME)
+
+# Верхние границы интервалов времени приготовления, минуты; последний
+# интервал открыт сверху.
+COOKING_TIME_BOUNDS = (15, 30, 60, 120)
+
+
+INTERVALS = tuple(zip(
+    (0, *COOKING_TIME_BOUNDS), (*COOKING_TIME_BOUNDS, None)
+))
+
+
+def _in_interval(low, high):
+    return Q(
+        cooking_time__gt=low,
+        **({} if high is None else {'cooking_time__lte': high}),
+    )
+
+
+def _histogram(counts):
+    return [
+        {'min': low + 1, 'max': high, 'count': counts[f'bucket{number}']}
+        for number, (low, high) in enumerate(INTERVALS)
+    ]
+
+
+def _count(queryset):
+    """Скалярный подзапрос с числом рецептов queryset."""
+    return Subquery(
+        queryset.order_by().annotate(count=Func(
+            'id', function='COUNT',
+            template='%(function)s(DISTINCT %(expressions)s)',
+        )).values('count'),
+        output_field=IntegerField(),
+    )
+
+
+def tag_counts(queryset, **extra):
+    """Все теги с числом рецептов из queryset — один запрос с GROUP BY."""
+    return list(
+        Tag.objects.annotate(count=Count(
+            'recipes',
+            filter=Q(recipes__in=queryset.order_by().values('id')),
+        ), **extra)
+        .order_by('name')
+        .values('id', 'name', 'slug', 'count', *extra)
+    )
+
+
+def cooking_time_histogram(queryset):
+    """Интервалы времени приготовления — один агрегирующий запрос."""
+    return _histogram(queryset.order_by().aggregate(**{
+        f'bucket{number}': Count(
+            'id', distinct=True, filter=_in_interval(low, high)
+        )
+        for number, (low, high) in enumerate(INTERVALS)
+    }))
+
+
+def recipe_facets(names, queryset, untagged_queryset):
+    """Фасеты names: queryset отфильтрован полностью, untagged — без тегов."""
+    facets = {}
+    if TAGS in names:
+        buckets = {}
+        if COOKING_TIME in names:
+            buckets = {
+                f'bucket{number}': _count(
+                    queryset.filter(_in_interval(low, high))
+                )
+                for number, (low, high) in enumerate(INTERVALS)
+            }
+        tags = tag_counts(untagged_queryset, **buckets)
+        facets[TAGS] = [
+            {
+                name: value for name, value in tag.items()
+                if name not in buckets
+            }
+            for tag in tags
+        ]
+        # Без тегов интервалам не в чем прийти: они считаются отдельно.
+        if buckets and tags:
+            facets[COOKING_TIME] = _histogram(tags[0])
+    if COOKING_TIME in names and COOKING_TIME not in facets:
+        facets[COOKING_TIME] = cooking_time_histogram(queryset)
+    return facets
@@ -0,0 +1,69 @@
+"""Счётчики поколений для инвалидации кэша ответов.
+
+Закэшированный ответ хранится под ключом, в который входят текущие
+значения нужных ему счётчиков. Изменение данных увеличивает счётчики,
+и старые ключи просто перестают читаться — перебирать их не нужно.
+
+Области:
+    all          — теги, ингредиенты, профили авторов;
+    list         — любой рецепт (общая лента без фильтров);
+    tag:<slug>   — рецепты с этим тегом;
+    author:<id>  — рецепты автора;
+    recipe:<id>  — конкретный рецепт;
+    ranking      — popularity и trending_score.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+
+KEY_PREFIX = 'recipes:gen:'
+
+# Отправляется после увеличения счётчиков; аргумент scopes — их области.
+generations_bumped = Signal()
+
+
+def _key(scope):
+    return KEY_PREFIX + scope
+
+
+def _initial():
+    # Счётчик, вытесненный из кэша, не должен вернуться к старому
+    # значению, иначе снова станут видны устаревшие ответы.
+    return time.time_ns()
+
+
+def get_generations(scopes):
+    keys = [_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, _initial(), None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def _bump(scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_key(scope))
+        except ValueError:
+            cache.add(_key(scope), _initial(), None)
+    generations_bumped.send(sender=None, scopes=scopes)
+
+
+def bump_generations(*scopes):
+    """Увеличивает счётчики после фиксации текущей транзакции."""
+    scopes = set(scopes)
+    if scopes:
+        transaction.on_commit(lambda: _bump(scopes))
+
+
+def recipe_scopes(recipe_id, author_id, tag_slugs=()):
+    return (
+        'list',
+        f'recipe:{recipe_id}',
+        f'author:{author_id}',
+        *(f'tag:{slug}' for slug in tag_slugs),
+    )
@@ -0,0 +1,105 @@
+"""Индексы в памяти процесса, которые перестраиваются в фоне.
+
+Первое построение идёт в запросе: отдавать ещё нечего. Дальше индекс,
+старше TTL или объявленный устаревшим, перестраивается в фоновом
+потоке, а запросы тем временем получают прежний. Объявление об
+устаревании (invalidate) хранится в кэше как версия, поэтому с общим
+кэшем его видят все процессы; с кэшем процесса остальные узнают об
+изменениях не позже чем через TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# Так часто процесс сверяет версию индекса с кэшем, секунды.
+CHECK_INTERVAL = 1.0
+
+
+class BackgroundIndex:
+    def __init__(self, build, ttl_setting, version_key=None):
+        self._build = build
+        self._ttl_setting = ttl_setting
+        self._version_key = version_key
+        self._index = None
+        self._built_at = 0.0
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._rebuilding = threading.Event()
+
+    def _current_version(self):
+        if self._version_key is None:
+            return None
+        return cache.get(self._version_key)
+
+    def _is_stale(self):
+        now = time.monotonic()
+        if now - self._built_at > getattr(settings, self._ttl_setting):
+            return True
+        if (
+            self._version_key is None
+            or now - self._checked_at < CHECK_INTERVAL
+        ):
+            return False
+        self._checked_at = now
+        return self._current_version() != self._version
+
+    def _rebuild(self):
+        # Версия читается до построения: изменения, пришедшие во время
+        # него, вызовут ещё одно перестроение.
+        version = self._current_version()
+        index = self._build()
+        with self._lock:
+            self._index = index
+            self._built_at = self._checked_at = time.monotonic()
+            self._version = version
+        return index
+
+    def rebuild(self):
+        with self._build_lock:
+            return self._rebuild()
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.rebuild()
+            finally:
+                connection.close()
+                self._rebuilding.clear()
+
+        if not self._rebuilding.is_set():
+            self._rebuilding.set()
+            threading.Thread(target=run, daemon=True).start()
+
+    def get(self):
+        with self._lock:
+            index = self._index
+            stale = index is not None and self._is_stale()
+        if index is None:
+            with self._build_lock:
+                if self._index is not None:
+                    return self._index
+                return self._rebuild()
+        if stale:
+            if settings.REBUILD_INDEXES_IN_BACKGROUND:
+                self._rebuild_in_background()
+            else:
+                index = self.rebuild()
+        return index
+
+    def invalidate(self):
+        """Объявляет индекс устаревшим.
+
+        В своём процессе — сразу, в остальных — после фиксации текущей
+        транзакции.
+        """
+        with self._lock:
+            self._built_at = float('-inf')
+        if self._version_key is not None:
+            transaction.on_commit(
+                lambda: cache.set(self._version_key, time.time_ns(), None)
+            )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from recipes.similarity import related_ids, update_recipe_signature
+
+
+class Command(BaseCommand):
+    help = 'Rebuild MinHash signatures and LSH buckets for all recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        recipes = Recipe.objects.order_by('id').only('id')
+        total = 0
+        batch = []
+        for recipe in recipes.iterator(chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) == batch_size:
+                total += self._build(batch)
+                batch = []
+        if batch:
+            total += self._build(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Signatures rebuilt: {total}'))
+
+    def _build(self, recipes):
+        ingredients, tags = related_ids([recipe.id for recipe in recipes])
+        for recipe in recipes:
+            update_recipe_signature(
+                recipe, ingredients[recipe.id], tags[recipe.id]
+            )
+        return len(recipes)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.ranking import decay_trending_scores, recount_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Decay trending scores of recipes; run periodically (e.g. hourly '
+        'from cron) with --hours equal to the interval between runs'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=float, default=1.0)
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Recalculate popularity from favorites and carts',
+        )
+
+    def handle(self, *args, **options):
+        factor = 0.5 ** (options['hours'] / settings.TRENDING_HALF_LIFE_HOURS)
+        decayed = decay_trending_scores(factor)
+        self.stdout.write(f'Trending scores decayed: {decayed}')
+        if options['recount']:
+            recount_popularity()
+            self.stdout.write('Popularity recounted')
+        self.stdout.write(self.style.SUCCESS('Recipe scores updated'))
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-19 10:32
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_scores(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    totals = Counter()
+    for model_name in ('Favorite', 'ShoppingCart'):
+        model = apps.get_model('recipes', model_name)
+        totals.update(dict(
+            model.objects.order_by().values('recipe_id')
+            .annotate(total=Count('id')).values_list('recipe_id', 'total')
+        ))
+    Recipe.objects.bulk_update(
+        [
+            Recipe(id=recipe_id, popularity=total, trending_score=total)
+            for recipe_id, total in totals.items()
+        ],
+        ['popularity', 'trending_score'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_signature_bucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='trending_score',
+            field=models.FloatField(default=0, editable=False, verbose_name='Рейтинг в трендах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-popularity', '-pub_date'], name='recipe_popular_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-trending_score', '-pub_date'], name='recipe_trending_idx'),
+        ),
+        migrations.RunPython(fill_scores, migrations.RunPython.noop),
+    ]
@@ -42,12 +42,21 @@ class Ingredient(models.Model):
         return f'{self.name} ({self.measurement_unit})'
 
 
+class AliveRecipeManager(models.Manager):
+    """Рецепты без помеченных на удаление (см. recipes.deletion)."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор',
+        # Покрывается составным индексом recipe_author_pub_date_idx.
+        db_index=False,
     )
     name = models.CharField('Название', max_length=200)
     image = models.ImageField('Картинка', upload_to='recipes/')
@@ -74,11 +83,50 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        db_index=True,
+    )
+    popularity = models.PositiveIntegerField(
+        'Популярность',
+        default=0,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        'Рейтинг в трендах',
+        default=0,
+        editable=False,
+    )
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = AliveRecipeManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date'], name='recipe_pub_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'],
+                name='recipe_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-popularity', '-pub_date'],
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=['-trending_score', '-pub_date'],
+                name='recipe_trending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -170,3 +218,84 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'В корзине {self.user}: {self.recipe}'
+
+
+class RecipeSignature(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='signature',
+    )
+    minhash = models.BinaryField('MinHash-сигнатура')
+
+    class Meta:
+        verbose_name = 'Сигнатура рецепта'
+        verbose_name_plural = 'Сигнатуры рецептов'
+
+    def __str__(self):
+        return f'Сигнатура {self.recipe_id}'
+
+
+class RecipeBucket(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='lsh_buckets',
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Корзина LSH')
+
+    class Meta:
+        verbose_name = 'LSH-корзина рецепта'
+        verbose_name_plural = 'LSH-корзины рецептов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'band'],
+                name='unique_recipe_band',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['band', 'bucket'],
+                name='recipe_bucket_lookup_idx',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.band}/{self.bucket}'
+
+
+class ChangeLog(models.Model):
+    """Журнал изменений каталога для инкрементальной синхронизации."""
+
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    KIND_CHOICES = (
+        (RECIPE, 'Рецепт'),
+        (TAG, 'Тег'),
+        (INGREDIENT, 'Ингредиент'),
+    )
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = (
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    seq = models.BigAutoField('Номер изменения', primary_key=True)
+    kind = models.CharField('Тип объекта', max_length=16,
+                            choices=KIND_CHOICES)
+    object_id = models.BigIntegerField('id объекта')
+    action = models.CharField('Действие', max_length=8,
+                              choices=ACTION_CHOICES)
+    created_at = models.DateTimeField('Время', auto_now_add=True)
+
+    class Meta:
+        ordering = ['seq']
+        verbose_name = 'Изменение каталога'
+        verbose_name_plural = 'Журнал изменений каталога'
+
+    def __str__(self):
+        return f'#{self.seq} {self.action} {self.kind}:{self.object_id}'
@@ -0,0 +1,72 @@
+from collections import Counter
+
+from django.db.models import Case, Count, F, Value, When
+from django.db.models.functions import Greatest
+
+from .generations import bump_generations
+from .models import Favorite, Recipe, ShoppingCart
+
+ORDERINGS = {
+    'popular': ('-popularity', '-pub_date'),
+    'trending': ('-trending_score', '-pub_date'),
+}
+
+
+def bump_recipe_scores(recipe_ids, delta):
+    """Меняет счётчики при добавлении в избранное или корзину."""
+    if not recipe_ids:
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        popularity=Greatest(F('popularity') + delta, Value(0)),
+        trending_score=Greatest(F('trending_score') + delta, Value(0.0)),
+    )
+    bump_generations('ranking')
+
+
+def decay_trending_scores(factor, threshold=0.01, batch_size=1000):
+    """Умножает trending_score на factor; ниже threshold — обнуляет.
+
+    Рецепты обновляются пачками по id, каждая — отдельным коротким
+    UPDATE, чтобы не держать блокировки всех строк сразу.
+    """
+    pending = Recipe.objects.filter(trending_score__gt=0).order_by('pk')
+    decayed = 0
+    last = 0
+    while batch := list(
+        pending.filter(pk__gt=last).values_list('pk', flat=True)[:batch_size]
+    ):
+        decayed += Recipe.objects.filter(pk__in=batch).update(
+            trending_score=Case(
+                When(
+                    trending_score__lt=threshold / factor,
+                    then=Value(0.0),
+                ),
+                default=F('trending_score') * factor,
+            )
+        )
+        last = batch[-1]
+    if decayed:
+        bump_generations('ranking')
+    return decayed
+
+
+def _counts_by_recipe(model):
+    return dict(
+        model.objects.order_by().values('recipe_id')
+        .annotate(total=Count('id')).values_list('recipe_id', 'total')
+    )
+
+
+def recount_popularity(batch_size=1000):
+    totals = Counter(_counts_by_recipe(Favorite))
+    totals.update(_counts_by_recipe(ShoppingCart))
+    batch = []
+    for recipe_id in Recipe.objects.order_by().values_list(
+        'id', flat=True
+    ).iterator(chunk_size=batch_size):
+        batch.append(Recipe(id=recipe_id, popularity=totals[recipe_id]))
+        if len(batch) == batch_size:
+            Recipe.objects.bulk_update(batch, ['popularity'])
+            batch = []
+    Recipe.objects.bulk_update(batch, ['popularity'])
+    bump_generations('ranking')
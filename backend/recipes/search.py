@@ -0,0 +1,146 @@
+import bisect
+import heapq
+import math
+from array import array
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Upper
+
+from .indexes import BackgroundIndex
+from .models import Ingredient
+
+MIN_FUZZY_LENGTH = 3
+
+# Порог совпадает с pg_trgm.word_similarity_threshold по умолчанию,
+# чтобы выдача на PostgreSQL и SQLite была одинаковой.
+WORD_SIMILARITY_THRESHOLD = 0.6
+
+
+def trigrams(text):
+    grams = set()
+    for word in text.lower().split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class IngredientIndex:
+    """Инвертированный триграммный индекс названий ингредиентов."""
+
+    def __init__(self, rows):
+        self.ids = array('q')
+        self.names = []
+        postings = defaultdict(lambda: array('l'))
+        for pk, name in rows:
+            position = len(self.ids)
+            self.ids.append(pk)
+            self.names.append(name.lower())
+            for gram in trigrams(name):
+                postings[gram].append(position)
+        self.postings = dict(postings)
+        self.order = array(
+            'l', sorted(range(len(self.names)), key=self.names.__getitem__)
+        )
+        self.sorted_names = [self.names[i] for i in self.order]
+
+    def _prefix(self, query, limit):
+        lo = bisect.bisect_left(self.sorted_names, query)
+        hi = bisect.bisect_left(self.sorted_names, query + '\uffff', lo)
+        return list(self.order[lo:min(hi, lo + limit)])
+
+    def _similar(self, query, limit, exclude):
+        grams = trigrams(query)
+        need = math.ceil(len(grams) * WORD_SIMILARITY_THRESHOLD)
+        hits = Counter()
+        for gram in grams:
+            hits.update(self.postings.get(gram, ()))
+        candidates = (
+            (count, position) for position, count in hits.items()
+            if count >= need and position not in exclude
+        )
+        return [
+            position for _, position in heapq.nsmallest(
+                limit,
+                candidates,
+                key=lambda item: (-item[0], self.names[item[1]]),
+            )
+        ]
+
+    def search(self, query, limit):
+        query = query.lower().strip()
+        positions = self._prefix(query, limit)
+        if len(positions) < limit and len(query) >= MIN_FUZZY_LENGTH:
+            positions += self._similar(
+                query, limit - len(positions), set(positions)
+            )
+        return [self.ids[position] for position in positions]
+
+
+def build_ingredient_index():
+    return IngredientIndex(
+        Ingredient.objects.order_by().values_list('id', 'name')
+        .iterator(chunk_size=10_000)
+    )
+
+
+ingredient_index = BackgroundIndex(
+    build_ingredient_index,
+    'INGREDIENT_INDEX_TTL',
+    version_key='recipes:ingredient-index',
+)
+
+
+def get_ingredient_index():
+    return ingredient_index.get()
+
+
+def invalidate_ingredient_index():
+    ingredient_index.invalidate()
+
+
+def _search_postgres(queryset, value, limit):
+    value = value.upper()
+    matches = Q(name_upper__startswith=value)
+    if len(value) >= MIN_FUZZY_LENGTH:
+        matches |= Q(name_upper__trigram_word_similar=value)
+    return (
+        queryset
+        .alias(name_upper=Upper('name'))
+        .filter(matches)
+        .annotate(
+            is_prefix=Case(
+                When(name_upper__startswith=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramWordSimilarity(value, 'name_upper'),
+        )
+        .order_by('-is_prefix', '-similarity', 'name')[:limit]
+    )
+
+
+def _search_in_process(queryset, value, limit):
+    ids = get_ingredient_index().search(value, limit)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).order_by(
+        Case(
+            *(When(id=pk, then=Value(rank)) for rank, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        )
+    )
+
+
+def search_ingredients(queryset, value):
+    """Сначала совпадения по началу названия, затем похожие по триграммам."""
+    value = value.strip()
+    if not value:
+        return queryset
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queryset, value, limit)
+    return _search_in_process(queryset, value, limit)
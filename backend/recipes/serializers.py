@@ -1,6 +1,17 @@
+from django.db import transaction
+from django.db.models import (
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    prefetch_related_objects,
+)
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from users.serializers import UserSerializer
+
 from .models import (
     Favorite,
     Ingredient,
@@ -9,6 +20,8 @@ from .models import (
     ShoppingCart,
     Tag,
 )
+from .generations import bump_generations
+from .similarity import refresh_recipe_signature
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -36,10 +49,9 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
 
 
 class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(),
-        source='ingredient',
-    )
+    # Существование ингредиентов проверяется одним запросом
+    # в RecipeWriteSerializer.validate_ingredients.
+    id = serializers.IntegerField(source='ingredient_id')
 
     class Meta:
         model = RecipeIngredient
@@ -53,7 +65,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
 
 
 class RecipeReadSerializer(serializers.ModelSerializer):
-    author = serializers.SerializerMethodField()
+    author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientReadSerializer(
         many=True,
@@ -79,14 +91,6 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
-    def get_author(self, obj):
-        from users.serializers import UserSerializer
-
-        return UserSerializer(
-            obj.author,
-            context=self.context
-        ).data
-
     def get_is_favorited(self, obj):
         user = self.context.get('request').user
         if user.is_anonymous:
@@ -108,10 +112,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientWriteSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True,
-    )
+    tags = serializers.ListField(child=serializers.IntegerField())
     image = Base64ImageField()
 
     class Meta:
@@ -125,19 +126,56 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'cooking_time',
         )
 
+    @staticmethod
+    def _check_exist(queryset, ids, message, *fields):
+        """Проверяет id одним запросом; возвращает {id: (fields)}."""
+        found = {
+            pk: tuple(values) for pk, *values in
+            queryset.order_by().values_list('id', *fields)
+        }
+        missing = [pk for pk in ids if pk not in found]
+        if missing:
+            raise serializers.ValidationError(
+                message.format(', '.join(map(str, missing)))
+            )
+        return found
+
+    def _with_current(self, queryset, ids, links, column, value):
+        """Объекты с id из ids и уже связанные с рецептом.
+
+        В current — значение связи с рецептом (None — связи нет): при
+        правке текущее состояние читается тем же запросом, что и
+        проверка присланных id.
+        """
+        if self.instance is None:
+            return queryset.filter(id__in=ids).annotate(
+                current=Value(None, output_field=IntegerField())
+            )
+        links = links.filter(recipe_id=self.instance.pk).order_by()
+        return queryset.filter(
+            Q(id__in=ids) | Q(id__in=links.values(column))
+        ).annotate(current=Subquery(
+            links.filter(**{column: OuterRef('pk')}).values(value)[:1]
+        ))
+
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError(
                 'Нужен хотя бы один ингредиент.'
             )
-        seen = set()
-        for item in value:
-            ingredient = item['ingredient']
-            if ingredient in seen:
-                raise serializers.ValidationError(
-                    'Ингредиенты не должны повторяться.'
-                )
-            seen.add(ingredient)
+        ids = [item['ingredient_id'] for item in value]
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться.'
+            )
+        # Текущие количества нужны, чтобы записать только изменения.
+        self._amounts = self._check_exist(
+            self._with_current(
+                Ingredient.objects.all(), ids,
+                RecipeIngredient.objects.all(), 'ingredient_id', 'amount',
+            ),
+            ids, 'Ингредиенты не существуют: {}.', 'current',
+        )
         return value
 
     def validate_tags(self, value):
@@ -149,20 +187,94 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 'Теги не должны повторяться.'
             )
+        # Слаги нужны для счётчиков поколений при сохранении, текущие
+        # связи — чтобы записать только изменения.
+        self._tags = self._check_exist(
+            self._with_current(
+                Tag.objects.all(), value,
+                Recipe.tags.through.objects.all(), 'tag_id', 'tag_id',
+            ),
+            value, 'Теги не существуют: {}.', 'slug', 'current',
+        )
         return value
 
-    def _create_ingredients(self, recipe, ingredients):
+    def _save_ingredients(self, recipe, ingredients):
+        # Строки, которые уже есть, меняются на месте (ON CONFLICT).
         RecipeIngredient.objects.bulk_create(
             [
                 RecipeIngredient(
                     recipe=recipe,
-                    ingredient=item['ingredient'],
+                    ingredient_id=item['ingredient_id'],
                     amount=item['amount'],
                 )
                 for item in ingredients
-            ]
+            ],
+            update_conflicts=True,
+            unique_fields=('recipe', 'ingredient'),
+            update_fields=('amount',),
         )
 
+    def _add_tags(self, recipe, tag_ids):
+        # Через промежуточную модель, без m2m_changed: журнал и счётчики
+        # обновляет сохранение рецепта, счётчики тегов — bump_generations.
+        Recipe.tags.through.objects.bulk_create(
+            (
+                Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_id)
+                for tag_id in tag_ids
+            ),
+            ignore_conflicts=True,
+        )
+        bump_generations(
+            *(f'tag:{self._tags[tag_id][0]}' for tag_id in tag_ids)
+        )
+
+    def _update_tags(self, recipe, tags):
+        current = {
+            pk for pk, (_, linked) in self._tags.items()
+            if linked is not None
+        }
+        removed = current - set(tags)
+        added = [tag_id for tag_id in tags if tag_id not in current]
+        if removed:
+            Recipe.tags.through.objects.filter(
+                recipe_id=recipe.pk, tag_id__in=removed
+            ).delete()
+            bump_generations(*(f'tag:{self._tags[pk][0]}' for pk in removed))
+        if added:
+            self._add_tags(recipe, added)
+        # Новые слаги известны: сохранение рецепта не перечитывает их.
+        recipe.saved_tag_slugs = [self._tags[pk][0] for pk in tags]
+        return bool(removed or added)
+
+    def _update_ingredients(self, recipe, ingredients):
+        """Меняет только добавленные, удалённые и изменённые строки.
+
+        Удалённые строки стираются одним DELETE, изменённые и новые
+        записываются одним INSERT ... ON CONFLICT. Возвращает True,
+        если изменился состав ингредиентов.
+        """
+        wanted = {
+            item['ingredient_id']: item['amount'] for item in ingredients
+        }
+        current = {
+            pk: amount for pk, (amount,) in self._amounts.items()
+            if amount is not None
+        }
+        removed = current.keys() - wanted.keys()
+        changed = [
+            {'ingredient_id': ingredient_id, 'amount': amount}
+            for ingredient_id, amount in wanted.items()
+            if current.get(ingredient_id) != amount
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe_id=recipe.pk, ingredient_id__in=removed
+            ).delete()
+        if changed:
+            self._save_ingredients(recipe, changed)
+        return wanted.keys() != current.keys()
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -172,24 +284,38 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             author=user,
             **validated_data
         )
-        recipe.tags.set(tags)
-        self._create_ingredients(recipe, ingredients)
+        self._add_tags(recipe, tags)
+        self._save_ingredients(recipe, ingredients)
+        refresh_recipe_signature.defer(recipe.pk)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        tags = validated_data.pop('tags')
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
 
-        instance.tags.set(tags)
-        instance.recipe_ingredients.all().delete()
-        self._create_ingredients(instance, ingredients)
-        instance.save()
+        tags_changed = (
+            tags is not None and self._update_tags(instance, tags)
+        )
+        ingredients_changed = (
+            ingredients is not None
+            and self._update_ingredients(instance, ingredients)
+        )
+        if tags_changed or ingredients_changed:
+            refresh_recipe_signature.defer(instance.pk)
+        try:
+            instance.save()
+        finally:
+            instance.__dict__.pop('saved_tag_slugs', None)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags', 'recipe_ingredients__ingredient'
+        )
         return RecipeReadSerializer(
             instance,
             context=self.context
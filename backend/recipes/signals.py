@@ -0,0 +1,130 @@
+import itertools
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from . import changelog
+from .generations import bump_generations, recipe_scopes
+from .models import ChangeLog, Ingredient, Recipe, Tag
+from .search import invalidate_ingredient_index
+
+# Поля профиля, которые показываются в рецептах автора.
+AUTHOR_FIELDS = frozenset(
+    {'email', 'username', 'first_name', 'last_name', 'avatar'}
+)
+
+
+def _tag_slugs(recipe):
+    # Сериализатор записи уже знает слаги и оставляет их на время save().
+    if hasattr(recipe, 'saved_tag_slugs'):
+        return recipe.saved_tag_slugs
+    return recipe.tags.values_list('slug', flat=True)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    invalidate_ingredient_index()
+    bump_generations('all')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_generations('all')
+
+
+@receiver(post_save, sender=Ingredient)
+def log_ingredient_saved(sender, instance, created, **kwargs):
+    changelog.record(ChangeLog.INGREDIENT, instance.pk)
+    if not created:
+        changelog.record_recipes_with(ingredients=instance)
+
+
+@receiver(post_save, sender=Tag)
+def log_tag_saved(sender, instance, created, **kwargs):
+    changelog.record(ChangeLog.TAG, instance.pk)
+    if not created:
+        changelog.record_recipes_with(tags=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def log_ingredient_deleted(sender, instance, **kwargs):
+    # Связи с рецептами ещё на месте: после удаления их уже не найти.
+    changelog.record_recipes_with(ingredients=instance)
+    changelog.record(ChangeLog.INGREDIENT, instance.pk, ChangeLog.DELETE)
+
+
+@receiver(pre_delete, sender=Tag)
+def log_tag_deleted(sender, instance, **kwargs):
+    changelog.record_recipes_with(tags=instance)
+    changelog.record(ChangeLog.TAG, instance.pk, ChangeLog.DELETE)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    changelog.record(ChangeLog.RECIPE, instance.pk)
+    # Теги нового рецепта учитываются в recipe_tags_changed.
+    bump_generations(*recipe_scopes(
+        instance.pk,
+        instance.author_id,
+        () if created else _tag_slugs(instance),
+    ))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    changelog.record(ChangeLog.RECIPE, instance.pk, ChangeLog.DELETE)
+    bump_generations(*recipe_scopes(
+        instance.pk, instance.author_id, _tag_slugs(instance)
+    ))
+
+
+def _log_tags_changed(instance, action, reverse, pk_set):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        changelog.record(ChangeLog.RECIPE, instance.pk)
+    elif action == 'pre_clear':
+        changelog.record_recipes_with(tags=instance)
+    elif pk_set:
+        changelog.record_recipes_with(pk__in=pk_set)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    _log_tags_changed(instance, action, reverse, pk_set)
+    if reverse:
+        bump_generations('all')
+    elif action in ('post_add', 'post_remove') and pk_set:
+        bump_generations(*(
+            f'tag:{slug}' for slug in
+            Tag.objects.filter(pk__in=pk_set)
+            .values_list('slug', flat=True)
+        ))
+    elif action == 'pre_clear':
+        bump_generations(*(f'tag:{slug}' for slug in _tag_slugs(instance)))
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created or (
+        update_fields is not None and AUTHOR_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    # Профиль виден только в рецептах автора: без них сбрасывать нечего.
+    rows = Recipe.objects.filter(author_id=instance.pk).values_list(
+        'id', 'tags__slug'
+    )
+    scopes = set(itertools.chain.from_iterable(
+        recipe_scopes(pk, instance.pk, () if slug is None else (slug,))
+        for pk, slug in rows
+    ))
+    if scopes:
+        changelog.record_author_changed(instance.pk)
+        bump_generations(*scopes)
@@ -0,0 +1,160 @@
+import hashlib
+import random
+from array import array
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from jobs.queue import task
+
+from .models import Recipe, RecipeBucket, RecipeIngredient, RecipeSignature
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_HASHES // BANDS
+CANDIDATES_LIMIT = 100
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_rng = random.Random(20240601)
+_COEFFICIENTS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(NUM_HASHES)
+]
+
+
+def _stable_hash(value):
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def recipe_features(ingredient_ids, tag_ids):
+    return (
+        {f'i{pk}' for pk in ingredient_ids}
+        | {f't{pk}' for pk in tag_ids}
+    )
+
+
+def minhash(features):
+    hashed = [_stable_hash(feature) & _MASK for feature in features]
+    return array('I', (
+        min(((a * x + b) % _PRIME) & _MASK for x in hashed)
+        if hashed else _MASK
+        for a, b in _COEFFICIENTS
+    ))
+
+
+def lsh_buckets(signature):
+    # У рецепта без ингредиентов и тегов сигнатура из одних _MASK: в
+    # общих корзинах все такие рецепты оказались бы «похожими».
+    if all(value == _MASK for value in signature):
+        return []
+    return [
+        (
+            band,
+            _stable_hash(
+                signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+                .tobytes().hex()
+            ),
+        )
+        for band in range(BANDS)
+    ]
+
+
+@transaction.atomic
+def update_recipe_signature(recipe, ingredient_ids, tag_ids, created=False):
+    signature = minhash(recipe_features(ingredient_ids, tag_ids))
+    packed = signature.tobytes()
+    if created or not RecipeSignature.objects.filter(recipe=recipe).update(
+        minhash=packed
+    ):
+        RecipeSignature.objects.create(recipe=recipe, minhash=packed)
+    if not created:
+        recipe.lsh_buckets.all().delete()
+    RecipeBucket.objects.bulk_create(
+        RecipeBucket(recipe=recipe, band=band, bucket=bucket)
+        for band, bucket in lsh_buckets(signature)
+    )
+    return signature
+
+
+def related_ids(recipe_ids):
+    ingredients = defaultdict(list)
+    tags = defaultdict(list)
+    for recipe_id, ingredient_id in (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .order_by().values_list('recipe_id', 'ingredient_id')
+    ):
+        ingredients[recipe_id].append(ingredient_id)
+    for recipe_id, tag_id in (
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids)
+        .values_list('recipe_id', 'tag_id')
+    ):
+        tags[recipe_id].append(tag_id)
+    return ingredients, tags
+
+
+@task
+def refresh_recipe_signature(recipe_id):
+    """Пересчитывает сигнатуру после изменения ингредиентов или тегов."""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None:
+        return
+    ingredients, tags = related_ids([recipe_id])
+    update_recipe_signature(recipe, ingredients[recipe_id], tags[recipe_id])
+
+
+def _signature_of(recipe):
+    """Сохранённая сигнатура рецепта или посчитанная на месте.
+
+    Запрос на чтение ничего не пишет: недостающие сигнатуры строит
+    manage.py build_recipe_signatures.
+    """
+    stored = (
+        RecipeSignature.objects.filter(recipe=recipe)
+        .values_list('minhash', flat=True).first()
+    )
+    if stored is not None:
+        return array('I', bytes(stored))
+    ingredients, tags = related_ids([recipe.id])
+    return minhash(recipe_features(ingredients[recipe.id], tags[recipe.id]))
+
+
+def similar_recipe_ids(recipe, limit):
+    """Рецепты с наибольшим пересечением ингредиентов и тегов.
+
+    Кандидаты берутся из совпадающих LSH-корзин, затем
+    пересортировываются по точному коэффициенту Жаккара. Корзины
+    удалённых, но ещё не стёртых рецептов пропускаются до отбора, иначе
+    они заняли бы места в первых limit.
+    """
+    buckets = Q()
+    for band, bucket in lsh_buckets(_signature_of(recipe)):
+        buckets |= Q(band=band, bucket=bucket)
+    if not buckets:
+        return []
+    candidate_ids = list(
+        RecipeBucket.objects.filter(buckets)
+        .filter(recipe__deleted_at__isnull=True)
+        .exclude(recipe_id=recipe.id)
+        .values('recipe_id')
+        .annotate(hits=Count('id'))
+        .order_by('-hits', 'recipe_id')
+        .values_list('recipe_id', flat=True)[:CANDIDATES_LIMIT]
+    )
+    if not candidate_ids:
+        return []
+    ingredients, tags = related_ids([recipe.id, *candidate_ids])
+    features = {
+        pk: recipe_features(ingredients[pk], tags[pk])
+        for pk in (recipe.id, *candidate_ids)
+    }
+    own = features[recipe.id]
+
+    def jaccard(recipe_id):
+        other = features[recipe_id]
+        union = len(own | other)
+        return len(own & other) / union if union else 0.0
+
+    return sorted(candidate_ids, key=lambda pk: (-jaccard(pk), pk))[:limit]
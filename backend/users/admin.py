@@ -1,16 +1,31 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 
+from recipes.admin import BackgroundDeleteMixin
+from recipes.deletion import delete_user
+
 from .models import Follow, User
 
 
 @admin.register(User)
-class UserAdmin(DjangoUserAdmin):
+class UserAdmin(BackgroundDeleteMixin, DjangoUserAdmin):
     list_display = ('id', 'email', 'username', 'first_name', 'last_name')
     search_fields = ('email', 'username')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(deleted_at__isnull=True)
+
+    def delete_model(self, request, obj):
+        delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
+
 
 @admin.register(Follow)
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     search_fields = ('user__username', 'author__username')
@@ -0,0 +1,181 @@
+"""Снимок графа подписок для рекомендаций авторов.
+
+Рекомендуются авторы, на которых подписаны авторы из подписок
+пользователя (два шага по Follow); вес кандидата — число таких
+подписок. В SQL это самосоединение users_follow, дорогое для активных
+пользователей, поэтому граф хранится в файле FOLLOW_GRAPH_PATH в
+формате CSR:
+
+    заголовок — сигнатура, число строк и число рёбер;
+    indptr    — по элементу на id пользователя: начало его строки;
+    indices   — id авторов из подписок, строка за строкой.
+
+Каждый процесс отображает файл в память только для чтения, так что
+страницы графа общие для всех воркеров хоста. Строка пользователя —
+срез memoryview без копирования, кандидаты считаются Counter'ом на C.
+Снимок старше FOLLOW_GRAPH_TTL перестраивается в фоновом потоке одного
+из процессов (остальных останавливает flock) и подменяется через
+os.replace; процессы замечают новый файл по inode. Результаты для
+пользователя кэшируются до следующего снимка.
+"""
+import fcntl
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from array import array
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Max
+
+from .models import Follow, User
+
+HEADER = struct.Struct('=8sQQ')
+MAGIC = b'FOLLOWG1'
+ITEM_SIZE = array('q').itemsize
+CHUNK_SIZE = 10_000
+
+# Так часто процесс проверяет, не появился ли новый снимок, секунды.
+CHECK_INTERVAL = 1.0
+
+# Столько кандидатов хранится в кэше: часть отсеется при выдаче
+# (подписки после снимка, удалённые пользователи).
+CANDIDATES = 100
+
+
+def build_follow_graph(path):
+    """Строит снимок из users_follow и атомарно подменяет им файл path."""
+    rows = (User.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+    indptr = array('q', bytes(ITEM_SIZE * (rows + 1)))
+    fd, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path) or '.', prefix='.follow-graph-'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.seek(HEADER.size + len(indptr) * ITEM_SIZE)
+            edges = (
+                Follow.objects.filter(user_id__lt=rows)
+                .order_by('user_id', 'author_id')
+                .values_list('user_id', 'author_id')
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            while batch := list(itertools.islice(edges, CHUNK_SIZE)):
+                for user_id, _ in batch:
+                    indptr[user_id + 1] += 1
+                array('q', (author_id for _, author_id in batch)).tofile(file)
+            indptr = array('q', itertools.accumulate(indptr))
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, rows, indptr[-1]))
+            indptr.tofile(file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class FollowGraph:
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            stat = os.fstat(file.fileno())
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.rows, _ = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f'{path}: не снимок графа подписок')
+        self.path = path
+        self.inode = stat.st_ino
+        self.built_at = stat.st_mtime
+        self.version = f'{stat.st_ino}:{stat.st_mtime_ns}'
+        items = memoryview(self._map)[HEADER.size:].cast('q')
+        self.indptr = items[:self.rows + 1]
+        self.indices = items[self.rows + 1:]
+
+    def following(self, user_id):
+        if not 0 <= user_id < self.rows:
+            return self.indices[:0]
+        return self.indices[self.indptr[user_id]:self.indptr[user_id + 1]]
+
+    def suggest(self, user_id, limit=CANDIDATES):
+        """Пары (id автора, вес) по убыванию веса."""
+        followees = self.following(user_id)
+        counts = Counter()
+        for author_id in followees:
+            counts.update(self.following(author_id))
+        counts.pop(user_id, None)
+        for author_id in followees:
+            counts.pop(author_id, None)
+        return heapq.nlargest(
+            limit, counts.items(), key=lambda item: (item[1], -item[0])
+        )
+
+
+_graph = None
+_graph_checked_at = 0.0
+_graph_lock = threading.Lock()
+_rebuilding = threading.Event()
+
+
+def _is_stale(path):
+    try:
+        return time.time() - os.stat(path).st_mtime > settings.FOLLOW_GRAPH_TTL
+    except FileNotFoundError:
+        return True
+
+
+def _rebuild(path):
+    """Перестраивает снимок, если его не перестроил другой процесс."""
+    with open(f'{path}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if _is_stale(path):
+            build_follow_graph(path)
+
+
+def _rebuild_in_background(path):
+    def run():
+        try:
+            _rebuild(path)
+        finally:
+            connection.close()
+            _rebuilding.clear()
+
+    if not _rebuilding.is_set():
+        _rebuilding.set()
+        threading.Thread(target=run, daemon=True).start()
+
+
+def get_follow_graph():
+    global _graph, _graph_checked_at
+    path = settings.FOLLOW_GRAPH_PATH
+    with _graph_lock:
+        now = time.monotonic()
+        if (
+            _graph is not None and _graph.path == path
+            and now - _graph_checked_at < CHECK_INTERVAL
+        ):
+            return _graph
+        _graph_checked_at = now
+        if not os.path.exists(path):
+            _rebuild(path)
+        elif _is_stale(path):
+            _rebuild_in_background(path)
+        inode = os.stat(path).st_ino
+        if _graph is None or _graph.path != path or _graph.inode != inode:
+            _graph = FollowGraph(path)
+        return _graph
+
+
+def suggested_authors(user_id):
+    """Кандидаты (id автора, вес) для пользователя из текущего снимка."""
+    graph = get_follow_graph()
+    key = f'users:suggestions:{graph.version}:{user_id}'
+    candidates = cache.get(key)
+    if candidates is None:
+        candidates = graph.suggest(user_id)
+        cache.set(key, candidates, settings.FOLLOW_GRAPH_TTL)
+    return candidates
@@ -12,6 +12,12 @@ class User(AbstractUser):
         blank=True,
         null=True,
     )
+    deleted_at = models.DateTimeField(
+        'Дата удаления',
+        null=True,
+        blank=True,
+        editable=False,
+    )
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -23,6 +29,22 @@ class User(AbstractUser):
         return self.username
 
 
+class StatelessUser(User):
+    """Пользователь, восстановленный из JWT без запроса к базе.
+
+    Все отложенные поля подгружаются одним запросом при первом
+    обращении к любому из них.
+    """
+
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None):
+        if fields is not None:
+            fields = list(set(fields) | self.get_deferred_fields())
+        super().refresh_from_db(using=using, fields=fields)
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -53,3 +75,15 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} -> {self.author}'
+
+
+class RevokedToken(models.Model):
+    jti = models.CharField('Идентификатор токена', max_length=64, unique=True)
+    expires_at = models.DateTimeField('Истекает', db_index=True)
+
+    class Meta:
+        verbose_name = 'Отозванный токен'
+        verbose_name_plural = 'Отозванные токены'
+
+    def __str__(self):
+        return self.jti
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import StatelessUser, User
+from .state import set_user_active
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=StatelessUser)
+def user_saved(sender, instance, **kwargs):
+    set_user_active(
+        instance.pk, instance.is_active and instance.deleted_at is None
+    )
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=StatelessUser)
+def user_deleted(sender, instance, **kwargs):
+    set_user_active(instance.pk, False)
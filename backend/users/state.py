@@ -0,0 +1,37 @@
+"""Признак «пользователю разрешён вход» в общем кэше.
+
+JWT-аутентификация (api.authentication) не читает строку пользователя
+на каждый запрос и проверяет этот признак. Он записывается после
+фиксации каждого сохранения или удаления пользователя, в том числе
+при мягком удалении (recipes.deletion). При промахе кэша признак
+читается из базы и кладётся через add(), чтобы устаревшее чтение не
+перезаписало свежую отметку.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import User
+
+KEY_PREFIX = 'users:active:'
+TIMEOUT = 300
+
+
+def _key(user_id):
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def is_active_user(user_id):
+    active = cache.get(_key(user_id))
+    if active is None:
+        active = User.objects.filter(
+            pk=user_id, is_active=True, deleted_at__isnull=True
+        ).exists()
+        cache.add(_key(user_id), active, TIMEOUT)
+    return active
+
+
+def set_user_active(user_id, active):
+    """Обновляет признак после фиксации текущей транзакции."""
+    transaction.on_commit(
+        lambda: cache.set(_key(user_id), active, TIMEOUT)
+    )
@@ -0,0 +1,66 @@
+import pytest
+
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def admin_client(client):
+    admin = User.objects.create_superuser(
+        email='admin@example.com', username='admin', password='secret-pass')
+    client.force_login(admin)
+    return client
+
+
+@pytest.fixture
+def recipes():
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    users = User.objects.bulk_create(
+        User(email=f'user{i}@example.com', username=f'user{i}')
+        for i in range(30)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=user, name=f'Рецепт {user.username}', text='t',
+               cooking_time=1, image='r.png')
+        for user in users
+    )
+    for recipe in recipes:
+        recipe.tags.add(tag)
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe)
+        for user in users for recipe in recipes[:3]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipes[0]) for user in users
+    )
+    return recipes
+
+
+@pytest.mark.parametrize('url', [
+    '/admin/recipes/recipe/',
+    '/admin/recipes/recipe/?author=1',
+    '/admin/recipes/favorite/',
+    '/admin/recipes/shoppingcart/',
+])
+def test_changelists_do_not_query_per_row(
+    admin_client, recipes, django_assert_max_num_queries, url
+):
+    with django_assert_max_num_queries(12):
+        assert admin_client.get(url).status_code == 200
+
+
+def test_author_filter_lists_only_recent_authors(admin_client, recipes):
+    response = admin_client.get('/admin/recipes/recipe/')
+    authors = [
+        spec for spec in response.context['cl'].filter_specs
+        if spec.title == 'Автор'
+    ][0]
+    assert len(authors.lookup_choices) == 10
+
+
+def test_recipe_change_form(admin_client, recipes):
+    response = admin_client.get(
+        f'/admin/recipes/recipe/{recipes[0].id}/change/')
+    assert response.status_code == 200
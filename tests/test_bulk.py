@@ -0,0 +1,96 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.bulk import bulk_link, bulk_unlink
+from recipes.models import Favorite, Recipe
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return User.objects.create_user(
+        email='u@example.com', username='u', password='secret-pass')
+
+
+@pytest.fixture
+def recipes(user):
+    return Recipe.objects.bulk_create(
+        Recipe(author=user, name=f'Рецепт {number}', text='t',
+               cooking_time=1, image='r.png')
+        for number in range(3)
+    )
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def popularity(recipe):
+    return Recipe.objects.values_list(
+        'popularity', flat=True).get(pk=recipe.pk)
+
+
+def test_bulk_favorite_reports_status_per_id(client, user, recipes):
+    first, second, _ = recipes
+    Favorite.objects.create(user=user, recipe=second)
+    response = client.post(
+        '/api/recipes/favorite/',
+        {'ids': [first.id, second.id, 10_000, first.id]},
+        format='json',
+    )
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'id': first.id, 'status': 'added'},
+        {'id': second.id, 'status': 'exists'},
+        {'id': 10_000, 'status': 'not_found'},
+    ]
+    assert popularity(first) == 1
+    assert popularity(second) == 0
+
+    response = client.delete(
+        '/api/recipes/favorite/', {'ids': [first.id, recipes[2].id]},
+        format='json',
+    )
+    assert [item['status'] for item in response.json()['results']] == [
+        'removed', 'absent']
+    assert popularity(first) == 0
+
+
+def test_link_made_by_concurrent_request_is_not_counted(
+    client, user, recipes
+):
+    recipe = recipes[0]
+    # Строку вставил параллельный запрос: этот не должен менять счётчик.
+    Favorite.objects.create(user=user, recipe=recipe)
+    response = client.post(f'/api/recipes/{recipe.id}/favorite/')
+    assert response.status_code == 400
+    assert popularity(recipe) == 0
+
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    assert client.post(
+        f'/api/recipes/{recipe.id}/favorite/').status_code == 201
+    assert popularity(recipe) == 1
+    # А здесь строку первым удалил параллельный запрос.
+    Favorite.objects.filter(user=user, recipe=recipe).delete()
+    response = client.delete(f'/api/recipes/{recipe.id}/favorite/')
+    assert response.status_code == 400
+    assert popularity(recipe) == 1
+
+
+def test_bulk_helpers_return_only_rows_they_changed(user):
+    authors = User.objects.bulk_create(
+        User(email=f'a{i}@example.com', username=f'a{i}') for i in range(2)
+    )
+    ids = [author.id for author in authors]
+    _, added = bulk_link(user.follower, 'author', User.objects.all(), ids)
+    assert added == ids
+    _, added = bulk_link(user.follower, 'author', User.objects.all(), ids)
+    assert added == []
+    _, removed = bulk_unlink(user.follower, 'author', ids)
+    assert removed == ids
+    assert not Follow.objects.exists()
@@ -0,0 +1,76 @@
+import pytest
+from rest_framework.test import APIClient
+
+from recipes.models import Favorite, Ingredient, Recipe, Tag
+from recipes.ranking import bump_recipe_scores
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    return Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {number}', text='t',
+               cooking_time=1, image='r.png')
+        for number in range(3)
+    )
+
+
+def revalidate(params, path='/api/recipes/'):
+    client = APIClient()
+    etag = client.get(path, params)['ETag']
+    return lambda: client.get(
+        path, params, HTTP_IF_NONE_MATCH=etag
+    ).status_code
+
+
+def test_unchanged_list_is_not_modified(
+    recipes, django_assert_num_queries
+):
+    status = revalidate({'limit': 2, 'ordering': 'popular'})
+    with django_assert_num_queries(1):
+        assert status() == 304
+
+
+def test_tag_and_ingredient_renames_invalidate_responses(
+    recipes, django_capture_on_commit_callbacks
+):
+    recipe = recipes[0]
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    recipe.tags.add(tag)
+    recipe.recipe_ingredients.create(ingredient=salt, amount=5)
+    detail = f'/api/recipes/{recipe.id}/'
+    for instance, name in ((tag, 'Обед'), (salt, 'морская соль')):
+        statuses = revalidate({}, detail), revalidate({'limit': 3})
+        instance.name = name
+        with django_capture_on_commit_callbacks(execute=True):
+            instance.save()
+        assert [status() for status in statuses] == [200, 200]
+
+
+def test_author_profile_change_invalidates_list(recipes):
+    status = revalidate({'limit': 2})
+    User.objects.filter(username='a').update(first_name='Анна')
+    assert status() == 200
+
+
+def test_favorite_moved_between_recipes_invalidates_list(recipes):
+    first, second, third = recipes
+    fan = User.objects.create_user(
+        email='f@example.com', username='f', password='secret-pass')
+    Favorite.objects.create(user=fan, recipe=first)
+    bump_recipe_scores([first.id], 1)
+    params = {'ordering': 'popular', 'limit': 1}
+    status = revalidate(params)
+
+    # Сумма popularity та же, но первым теперь другой рецепт.
+    Favorite.objects.filter(user=fan).update(recipe=third)
+    bump_recipe_scores([first.id], -1)
+    bump_recipe_scores([third.id], 1)
+    assert status() == 200
+    assert APIClient().get('/api/recipes/', params).data['results'][0][
+        'id'] == third.id
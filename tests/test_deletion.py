@@ -0,0 +1,137 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from jobs.queue import execute
+from recipes import deletion
+from recipes.models import (
+    ChangeLog, Favorite, Ingredient, Recipe, RecipeIngredient,
+    ShoppingCart, Tag,
+)
+from recipes.ranking import recount_popularity
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    fans = User.objects.bulk_create(
+        User(email=f'fan{i}@example.com', username=f'fan{i}')
+        for i in range(25)
+    )
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {number}', text='t',
+               cooking_time=1, image='r.png')
+        for number in range(3)
+    )
+    for recipe in recipes:
+        recipe.tags.add(tag)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=salt, amount=1)
+    Favorite.objects.bulk_create(
+        Favorite(user=fan, recipe=recipe)
+        for fan in fans for recipe in recipes
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=fan, recipe=recipes[0]) for fan in fans
+    )
+    Follow.objects.bulk_create(Follow(user=fan, author=author) for fan in fans)
+    return {'author': author, 'fans': fans, 'recipes': recipes}
+
+
+def run_jobs():
+    for job in Job.objects.all():
+        assert execute(job), job.last_error
+
+
+def test_recipe_is_hidden_at_once_and_purged_in_background(
+    catalogue, django_capture_on_commit_callbacks
+):
+    recipe = catalogue['recipes'][0]
+    client = APIClient()
+    client.force_authenticate(catalogue['author'])
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.delete(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 204
+
+    assert client.get(f'/api/recipes/{recipe.id}/').status_code == 404
+    assert Favorite.objects.filter(recipe=recipe).count() == 25
+    assert ChangeLog.objects.filter(
+        object_id=recipe.id, action=ChangeLog.DELETE).exists()
+
+    run_jobs()
+    assert not Recipe.all_objects.filter(id=recipe.id).exists()
+    assert not Favorite.objects.filter(recipe=recipe).exists()
+    assert not ShoppingCart.objects.exists()
+    assert not RecipeIngredient.objects.filter(recipe=recipe).exists()
+    assert Favorite.objects.count() == 50
+
+
+def test_purge_deletes_in_fixed_batches(catalogue):
+    recipe = catalogue['recipes'][0]
+    deletion.hide_recipes(Recipe.objects.filter(id=recipe.id))
+    with CaptureQueriesContext(connection) as queries:
+        deletion.purge(
+            Recipe.all_objects.filter(id=recipe.id), batch_size=10
+        )
+    deletes = [
+        query['sql'] for query in queries
+        if query['sql'].startswith('DELETE FROM "recipes_favorite"')
+    ]
+    # 25 строк избранного — три пачки, не больше 10 id в каждой.
+    assert len(deletes) == 3
+    assert Favorite.objects.count() == 50
+
+
+def test_user_deletion_cascades_in_background(
+    catalogue, django_capture_on_commit_callbacks
+):
+    author = catalogue['author']
+    token = Token.objects.create(user=author)
+    client = APIClient()
+    client.force_authenticate(author)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.delete(
+            '/api/users/me/', {'current_password': 'secret-pass'})
+    assert response.status_code == 204
+
+    anonymous = APIClient()
+    assert anonymous.get(f'/api/users/{author.id}/').status_code == 404
+    assert User.objects.get(id=author.id).is_active is False
+
+    fan = APIClient()
+    fan.force_authenticate(catalogue['fans'][0])
+    assert fan.get('/api/users/subscriptions/').json()['count'] == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        run_jobs()
+    assert anonymous.get('/api/recipes/').json()['count'] == 0
+    assert not User.objects.filter(id=author.id).exists()
+    assert not Token.objects.filter(key=token.key).exists()
+    assert not Recipe.all_objects.exists()
+    assert not Favorite.objects.exists()
+    assert not Follow.objects.exists()
+    assert ChangeLog.objects.filter(action=ChangeLog.DELETE).count() == 3
+
+
+def test_purged_user_no_longer_counts_in_scores(
+    catalogue, django_capture_on_commit_callbacks
+):
+    recount_popularity()
+    fan = catalogue['fans'][0]
+    with django_capture_on_commit_callbacks(execute=True):
+        deletion.delete_user(fan)
+    with django_capture_on_commit_callbacks(execute=True):
+        run_jobs()
+    assert list(
+        Recipe.objects.order_by('pk').values_list('popularity', flat=True)
+    ) == [48, 24, 24]
+    assert Favorite.objects.count() == 72
@@ -0,0 +1,100 @@
+import asyncio
+import json
+
+import pytest
+from asgiref.sync import sync_to_async
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.events import EventStreamASGI, issue_ticket
+from recipes.models import Recipe
+from users.models import Follow, User
+
+# Поток проверяет токен в отдельном потоке со своим соединением с базой.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+async def not_found(scope, receive, send):
+    raise AssertionError('запрос не должен уйти в Django')
+
+
+def make_user(name):
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name, password='secret-pass')
+
+
+def publish_recipe(author, name):
+    return Recipe.objects.create(
+        author=author, name=name, text='t', cooking_time=1, image='r.png')
+
+
+async def open_stream(query_string, headers=()):
+    inbox, outbox = asyncio.Queue(), asyncio.Queue()
+    scope = {
+        'type': 'http',
+        'path': '/api/events/',
+        'query_string': query_string.encode(),
+        'headers': list(headers),
+    }
+    task = asyncio.ensure_future(
+        EventStreamASGI(not_found)(scope, inbox.get, outbox.put)
+    )
+    return task, inbox, outbox
+
+
+async def next_message(outbox):
+    return await asyncio.wait_for(outbox.get(), timeout=5)
+
+
+def test_stream_delivers_recipes_of_followed_authors():
+    author, stranger, reader = map(make_user, ('author', 'stranger', 'reader'))
+    Follow.objects.create(user=reader, author=author)
+    client = APIClient()
+    client.force_authenticate(reader)
+    ticket = client.post('/api/events/ticket/').json()['ticket']
+
+    async def scenario():
+        task, inbox, outbox = await open_stream(f'ticket={ticket}')
+        start = await next_message(outbox)
+        assert start['status'] == 200
+        assert (b'content-type', b'text/event-stream; charset=utf-8') in (
+            start['headers']
+        )
+        await next_message(outbox)
+        await sync_to_async(publish_recipe)(stranger, 'Чужой')
+        recipe = await sync_to_async(publish_recipe)(author, 'Свой')
+        body = (await next_message(outbox))['body'].decode()
+        event, data = body.strip().split('\n')
+        assert event == 'event: recipe'
+        assert json.loads(data.removeprefix('data: ')) == {
+            'id': recipe.id, 'name': 'Свой', 'author': author.id,
+        }
+        await inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, timeout=5)
+
+    asyncio.run(scenario())
+
+
+def test_stream_requires_authentication():
+    reader = make_user('reader')
+    token = Token.objects.create(user=reader)
+    ticket = issue_ticket(reader)
+
+    async def status(query_string, headers=()):
+        task, inbox, outbox = await open_stream(query_string, headers)
+        start = await next_message(outbox)
+        await inbox.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(task, timeout=5)
+        return start['status']
+
+    async def scenario():
+        assert await status(f'token={token.key}') == 401
+        assert await status('ticket=wrong') == 401
+        assert await status(f'ticket={ticket}') == 200
+        # Билет одноразовый.
+        assert await status(f'ticket={ticket}') == 401
+        assert await status('', [
+            (b'authorization', f'Token {token.key}'.encode())
+        ]) == 200
+
+    asyncio.run(scenario())
@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    recipes = []
+    for number in range(5):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='t',
+            cooking_time=1, image='r.png')
+        recipe.tags.add(tag)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=salt, amount=number + 1)
+        recipes.append(recipe)
+    return recipes
+
+
+@pytest.fixture
+def staff_client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(
+        email='s@example.com', username='s', password='secret-pass',
+        is_staff=True,
+    ))
+    return client
+
+
+def read_lines(response):
+    content = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+        content = gzip.decompress(content)
+    return [json.loads(line) for line in content.decode().splitlines()]
+
+
+def test_export_streams_every_recipe_and_resumes(staff_client, recipes):
+    items = read_lines(staff_client.get('/api/recipes/export/'))
+    assert [item['id'] for item in items] == [r.id for r in recipes]
+    assert items[2]['ingredients'][0]['amount'] == 3
+    assert items[0]['tags'][0]['slug'] == 'dinner'
+
+    resumed = read_lines(staff_client.get(
+        '/api/recipes/export/', {'after': recipes[2].id},
+        HTTP_ACCEPT_ENCODING='gzip',
+    ))
+    assert resumed == items[3:]
+
+
+def test_export_is_staff_only(recipes):
+    client = APIClient()
+    assert client.get('/api/recipes/export/').status_code == 401
+    client.force_authenticate(recipes[0].author)
+    assert client.get('/api/recipes/export/').status_code == 403
+
+
+def test_export_command_appends_gzip(recipes, tmp_path, settings):
+    settings.PRERENDER_BASE_URL = 'http://testserver'
+    path = tmp_path / 'recipes.ndjson.gz'
+    call_command('export_recipes', '--gzip', '-o', str(path),
+                 '--chunk-size', '2', '--after', str(recipes[1].id))
+    call_command('export_recipes', '--gzip', '-o', str(path),
+                 '--after', str(recipes[3].id))
+    with gzip.open(path, 'rt') as file:
+        ids = [json.loads(line)['id'] for line in file]
+    assert ids == [r.id for r in recipes[2:]] + [recipes[4].id]
@@ -0,0 +1,83 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    other = User.objects.create_user(
+        email='b@example.com', username='b', password='secret-pass')
+    dinner = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    lunch = Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+    for cooking_time, owner, tags in [
+        (10, author, [dinner]),
+        (25, author, [dinner, lunch]),
+        (45, author, [lunch]),
+        (200, author, []),
+        (20, other, [dinner]),
+    ]:
+        recipe = Recipe.objects.create(
+            author=owner, name='r', text='t', image='r.png',
+            cooking_time=cooking_time)
+        recipe.tags.set(tags)
+    return {'author': author}
+
+
+def get(params):
+    response = APIClient().get('/api/recipes/', params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_facets_follow_current_filters(catalogue):
+    data = get({
+        'author': catalogue['author'].id,
+        'tags': 'dinner',
+        'facets': 'tags,cooking_time',
+    })
+    assert data['count'] == 2
+    assert {
+        tag['slug']: tag['count'] for tag in data['facets']['tags']
+    } == {'breakfast': 0, 'dinner': 2, 'lunch': 2}
+    assert [
+        (bucket['min'], bucket['max'], bucket['count'])
+        for bucket in data['facets']['cooking_time']
+    ] == [(1, 15, 1), (16, 30, 1), (31, 60, 0), (61, 120, 0), (121, None, 0)]
+
+
+def test_facets_cost_one_query(catalogue):
+    client = APIClient()
+    client.force_authenticate(catalogue['author'])
+
+    def count_queries(params):
+        with CaptureQueriesContext(connection) as queries:
+            assert client.get('/api/recipes/', params).status_code == 200
+        return len(queries)
+
+    plain = count_queries({'tags': ['dinner', 'lunch']})
+    assert count_queries(
+        {'tags': ['dinner', 'lunch'], 'facets': 'tags,cooking_time'}
+    ) == plain + 1
+    assert 'facets' not in get({})
+
+
+def test_unknown_facet_is_rejected(catalogue):
+    response = APIClient().get('/api/recipes/', {'facets': 'calories'})
+    assert response.status_code == 400
+
+
+def test_histogram_without_tags(catalogue):
+    Tag.objects.all().delete()
+    facets = get({'facets': 'tags,cooking_time'})['facets']
+    assert facets['tags'] == []
+    assert [bucket['count'] for bucket in facets['cooking_time']] == [
+        1, 2, 1, 0, 1]
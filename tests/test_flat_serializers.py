@@ -0,0 +1,145 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.flat import (
+    flat_ingredient,
+    flat_recipe,
+    flat_short_recipe,
+    flat_user,
+    serialize_recipes,
+    serialize_users,
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from recipes.serializers import (
+    IngredientSerializer,
+    RecipeReadSerializer,
+    ShortRecipeSerializer,
+)
+from users.models import Follow, User
+from users.serializers import UserSerializer
+
+pytestmark = pytest.mark.django_db
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.fixture
+def data():
+    alice = User.objects.create_user(
+        email='alice@example.com', username='alice',
+        first_name='Алиса', last_name='Л', password='secret-pass',
+        avatar='users/avatars/alice.png',
+    )
+    bob = User.objects.create_user(
+        email='bob@example.com', username='bob',
+        first_name='Боб', last_name='Б', password='secret-pass',
+    )
+    breakfast = Tag.objects.create(
+        name='Завтрак', color='#E26C2D', slug='breakfast')
+    dinner = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    salt_spoon = Ingredient.objects.create(
+        name='соль', measurement_unit='ч. л.')
+    milk = Ingredient.objects.create(name='молоко', measurement_unit='мл')
+    recipes = []
+    for number, (author, tags, ingredients) in enumerate([
+        (alice, [dinner, breakfast], [(salt, 5), (milk, 200)]),
+        (bob, [breakfast], [(salt_spoon, 1), (salt, 3)]),
+        (bob, [], [(milk, 50)]),
+    ]):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Рецепт «{number}»',
+            image=f'recipes/{number}.png',
+            text='Описание\nв две строки',
+            cooking_time=10 + number,
+        )
+        recipe.tags.set(tags)
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=item, amount=amount)
+            for item, amount in ingredients
+        )
+        recipes.append(recipe)
+    Favorite.objects.create(user=alice, recipe=recipes[1])
+    ShoppingCart.objects.create(user=alice, recipe=recipes[2])
+    Follow.objects.create(user=alice, author=bob)
+    return {'alice': alice, 'bob': bob, 'recipes': recipes}
+
+
+@pytest.fixture(params=['anonymous', 'alice', 'bob'])
+def request_as(request, data):
+    drf_request = Request(APIRequestFactory().get('/api/recipes/'))
+    drf_request.user = (
+        AnonymousUser() if request.param == 'anonymous'
+        else data[request.param]
+    )
+    return drf_request
+
+
+def test_recipes_match_read_serializer(request_as):
+    recipes = Recipe.objects.all()
+    expected = RecipeReadSerializer(
+        recipes, many=True, context={'request': request_as}
+    ).data
+    rows = list(recipes.values(*flat_recipe.columns))
+    assert render(serialize_recipes(rows, request_as)) == render(expected)
+
+
+def test_short_recipes_match_serializer(request_as):
+    recipes = Recipe.objects.all()
+    context = {'request': request_as}
+    expected = ShortRecipeSerializer(recipes, many=True, context=context).data
+    flat = flat_short_recipe.represent_many(
+        recipes.values(*flat_short_recipe.columns), context
+    )
+    assert render(flat) == render(expected)
+
+
+def test_users_match_serializer(request_as):
+    users = User.objects.all()
+    expected = UserSerializer(
+        users, many=True, context={'request': request_as}
+    ).data
+    rows = list(users.values(*flat_user.columns))
+    assert render(serialize_users(rows, request_as)) == render(expected)
+
+
+def test_ingredients_match_serializer(data):
+    ingredients = Ingredient.objects.all()
+    expected = IngredientSerializer(ingredients, many=True).data
+    flat = flat_ingredient.represent_many(
+        ingredients.values(*flat_ingredient.columns), {}
+    )
+    assert render(flat) == render(expected)
+
+
+def test_recipe_endpoints_match_read_serializer(data):
+    client = APIClient()
+    client.force_authenticate(data['alice'])
+    factory_request = Request(APIRequestFactory().get('/'))
+    factory_request.user = data['alice']
+    context = {'request': factory_request}
+
+    response = client.get('/api/recipes/', {'limit': 2})
+    ids = [item['id'] for item in response.data['results']]
+    expected = RecipeReadSerializer(
+        [Recipe.objects.get(id=pk) for pk in ids], many=True, context=context
+    ).data
+    assert render(response.data['results']) == render(expected)
+
+    recipe = data['recipes'][1]
+    response = client.get(f'/api/recipes/{recipe.id}/')
+    expected = RecipeReadSerializer(recipe, context=context).data
+    assert response.content == render(expected)
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.models import IdempotencyKey
+from recipes.models import Ingredient, Recipe, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture
+def client():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass'))
+    return client
+
+
+@pytest.fixture
+def payload():
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    return {
+        'ingredients': [{'id': salt.id, 'amount': 5}],
+        'tags': [tag.id],
+        'name': 'Суп',
+        'image': PNG,
+        'text': 'Сварить.',
+        'cooking_time': 30,
+    }
+
+
+def post(client, payload, key):
+    return client.post(
+        '/api/recipes/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+    )
+
+
+def test_retry_replays_stored_response(client, payload):
+    first = post(client, payload, 'retry-1')
+    second = post(client, payload, 'retry-1')
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second['Idempotent-Replayed'] == 'true'
+    assert Recipe.objects.count() == 1
+
+    assert post(client, payload, 'retry-2').status_code == 201
+    assert Recipe.objects.count() == 2
+
+
+def test_key_reused_for_other_request_is_rejected(client, payload):
+    assert post(client, payload, 'reused').status_code == 201
+    response = post(client, {**payload, 'name': 'Другой'}, 'reused')
+    assert response.status_code == 422
+    assert Recipe.objects.count() == 1
+
+
+def test_failed_request_can_be_retried(client, payload):
+    response = post(client, {**payload, 'ingredients': []}, 'fix-and-retry')
+    assert response.status_code == 400
+    assert not IdempotencyKey.objects.exists()
+    assert post(client, payload, 'fix-and-retry').status_code == 201
+
+
+def test_avatar_upload_is_idempotent(client):
+    responses = [
+        client.put(
+            '/api/users/me/avatar/', {'avatar': PNG}, format='json',
+            HTTP_IDEMPOTENCY_KEY='avatar-1',
+        )
+        for _ in range(2)
+    ]
+    assert [response.status_code for response in responses] == [200, 200]
+    assert responses[1].json() == responses[0].json()
+    assert responses[1]['Idempotent-Replayed'] == 'true'
+
+
+def test_large_upload_is_accepted_with_key(client, payload, settings):
+    # Данные разбираются потоком; request.body упёрся бы в этот лимит.
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = len(PNG) // 2
+    assert post(client, payload, 'large').status_code == 201
+    assert post(client, payload, 'large')['Idempotent-Replayed'] == 'true'
+    assert Recipe.objects.count() == 1
+
+
+def test_key_of_running_request_is_busy(client, payload):
+    IdempotencyKey.objects.create(
+        user=User.objects.get(), key='running', fingerprint='-')
+    assert post(client, payload, 'running').status_code == 409
+    assert not Recipe.objects.exists()
+
+    # Запись осталась от упавшего процесса: повтор выполняется.
+    IdempotencyKey.objects.update(
+        created_at=timezone.now() - timedelta(hours=1))
+    assert post(client, payload, 'running').status_code == 201
+    assert IdempotencyKey.objects.get().status_code == 201
+
+
+def test_expired_keys_are_cleared(client, payload, settings):
+    post(client, payload, 'old')
+    settings.IDEMPOTENCY_KEY_TTL = -1
+    call_command('clear_idempotency_keys')
+    assert not IdempotencyKey.objects.exists()
@@ -0,0 +1,90 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs import queue
+from jobs.queue import claim, execute, task
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@task(name='tests.record', max_attempts=2)
+def record(value):
+    calls.append(value)
+
+
+@task(name='tests.explode', max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@task(name='tests.slow')
+def slow():
+    time.sleep(0.3)
+    calls.append(Job.objects.get().locked_at)
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def test_defer_waits_for_commit(django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        record.defer(1)
+        assert not Job.objects.exists()
+    callbacks[0]()
+    assert Job.objects.get().payload == {'args': [1], 'kwargs': {}}
+
+
+def test_job_is_claimed_once_and_scheduled_jobs_wait():
+    record.schedule(timezone.now(), 'now')
+    record.schedule(timezone.now() + timedelta(hours=1), 'later')
+    jobs = claim('first', limit=10)
+    assert [job.payload['args'] for job in jobs] == [['now']]
+    assert claim('second', limit=10) == []
+    assert execute(jobs[0])
+    assert calls == ['now']
+    assert Job.objects.get().payload['args'] == ['later']
+
+
+def test_failed_job_is_retried_with_backoff_then_marked_failed():
+    explode.schedule(timezone.now())
+    job = claim('worker')[0]
+    assert not execute(job)
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED
+    assert job.run_at > timezone.now()
+    assert 'boom' in job.last_error
+
+    Job.objects.update(run_at=timezone.now())
+    assert not execute(claim('worker')[0])
+    assert Job.objects.get().status == Job.FAILED
+
+
+def test_expired_lease_is_reclaimed():
+    record.schedule(timezone.now(), 'lost')
+    claim('crashed')
+    Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+    assert claim('alive')[0].locked_by == 'alive'
+
+
+def test_running_job_renews_its_lease(transactional_db, monkeypatch):
+    monkeypatch.setattr(queue, 'HEARTBEAT', timedelta(seconds=0.05))
+    slow.schedule(timezone.now())
+    job = claim('worker')[0]
+    assert execute(job)
+    assert calls[0] > job.locked_at
+
+
+def test_run_worker_burst(transactional_db):
+    record.schedule(timezone.now(), 'burst')
+    call_command('run_worker', '--burst', '--concurrency', '2')
+    assert calls == ['burst']
+    assert not Job.objects.exists()
@@ -0,0 +1,95 @@
+import pytest
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import StatelessJWTAuthentication, revoke_token
+from recipes.deletion import delete_user
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def jwt_mode(monkeypatch):
+    cache.clear()
+    # Классы аутентификации читаются из настроек при импорте представлений.
+    monkeypatch.setattr(
+        APIView, 'authentication_classes', [StatelessJWTAuthentication]
+    )
+
+
+@pytest.fixture
+def users():
+    return [
+        User.objects.create_user(
+            email=f'{name}@example.com', username=name,
+            password='secret-pass')
+        for name in ('reader', 'author')
+    ]
+
+
+def client_for(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def subscribe(client, author):
+    return client.post(f'/api/users/{author.id}/subscribe/')
+
+
+def test_revoked_token_is_rejected(users):
+    token = AccessToken.for_user(users[0])
+    client = client_for(token)
+    assert client.get('/api/users/me/').status_code == 200
+    revoke_token(token)
+    assert client.get('/api/users/me/').status_code == 401
+
+
+def test_deactivated_user_loses_access(
+    users, django_capture_on_commit_callbacks
+):
+    reader, author = users
+    client = client_for(AccessToken.for_user(reader))
+    assert client.get('/api/users/me/').status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        reader.is_active = False
+        reader.save()
+    assert client.get('/api/users/me/').status_code == 401
+    assert subscribe(client, author).status_code == 401
+
+
+def test_writes_check_the_row_itself(users):
+    reader, author = users
+    client = client_for(AccessToken.for_user(reader))
+    assert client.get('/api/users/me/').status_code == 200
+    # Признак в кэше ещё не обновлён, но изменение читает строку.
+    User.objects.filter(pk=reader.pk).update(is_active=False)
+    assert subscribe(client, author).status_code == 401
+
+
+def test_deleted_and_purged_users_are_rejected(
+    users, django_capture_on_commit_callbacks
+):
+    reader, author = users
+    client = client_for(AccessToken.for_user(reader))
+    with django_capture_on_commit_callbacks(execute=True):
+        delete_user(reader)
+    assert client.get('/api/users/me/').status_code == 401
+
+    User.objects.filter(pk=reader.pk).delete()
+    cache.clear()
+    assert client.get('/api/users/me/').status_code == 401
+    assert subscribe(client, author).status_code == 401
+
+
+def test_jwt_mode_requires_shared_cache(settings):
+    settings.AUTH_MODE = 'jwt'
+    settings.SHARED_CACHE = False
+    with pytest.raises(ImproperlyConfigured):
+        apps.get_app_config('api').ready()
@@ -0,0 +1,45 @@
+import io
+import tracemalloc
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def profiled(settings, tmp_path):
+    settings.MEMORY_PROFILING_DIR = str(tmp_path)
+    settings.MEMORY_PROFILING_EVERY = 2
+    settings.MIDDLEWARE = [
+        'api.memory.MemoryProfileMiddleware', *settings.MIDDLEWARE
+    ]
+    yield tmp_path
+    tracemalloc.stop()
+
+
+def test_report_shows_routes_and_worker_growth(profiled):
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(200)
+    )
+    client = APIClient()
+    for _ in range(2):
+        assert client.get('/api/ingredients/').status_code == 200
+        assert client.get('/api/recipes/').status_code == 200
+
+    output = io.StringIO()
+    call_command('memory_report', stdout=output)
+    report = output.getvalue()
+    assert 'GET ingredients-list' in report
+    assert 'GET recipes-list' in report
+    assert 'growth over 2 requests' in report
+
+
+def test_report_requires_profiling_dir(settings):
+    settings.MEMORY_PROFILING_DIR = ''
+    with pytest.raises(Exception, match='MEMORY_PROFILING_DIR'):
+        call_command('memory_report')
@@ -0,0 +1,88 @@
+import pytest
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.test import APIClient
+
+from api.prerender import (
+    file_path,
+    list_url,
+    prerender,
+    refresh_prerendered,
+    refresh_scopes,
+    tag_combinations,
+)
+from jobs.models import Job
+from jobs.queue import execute
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+def test_tag_combinations_follow_tag_order():
+    assert tag_combinations(['a', 'b']) == [(), ('a',), ('b',), ('a', 'b')]
+    assert len(tag_combinations(list('abcdef'))) == 8
+
+
+@pytest.mark.django_db
+def test_prerendered_file_matches_response(
+    settings, tmp_path, django_capture_on_commit_callbacks
+):
+    settings.PRERENDER_ROOT = str(tmp_path)
+    settings.PRERENDER_BASE_URL = 'http://testserver'
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    recipe = Recipe.objects.create(
+        author=author, name='Суп', text='t', cooking_time=1, image='r.png')
+    recipe.tags.set([tag])
+    url = list_url(1, ['dinner'])
+
+    assert prerender(url)
+    path = file_path(url)
+    assert path.name == '?page=1&limit=6&tags=dinner.json'
+    assert path.read_bytes() == APIClient().get(url).content
+
+    recipe.delete()
+    Job.objects.all().delete()
+    with django_capture_on_commit_callbacks(execute=True):
+        # Рейтинг и страницы автора в готовых файлах не участвуют.
+        refresh_prerendered(None, scopes={'ranking', f'author:{author.id}'})
+    assert not Job.objects.exists()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        refresh_prerendered(None, scopes={'list', 'tag:dinner'})
+    job = Job.objects.get()
+    assert job.name == refresh_scopes.name
+    assert execute(job)
+    assert b'"count":0' in path.read_bytes()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        refresh_prerendered(None, scopes={'all'})
+    assert execute(Job.objects.latest('id'))
+    assert not tmp_path.exists()
+
+
+@pytest.mark.django_db
+def test_prerender_ignores_response_cache(settings, tmp_path):
+    settings.PRERENDER_ROOT = str(tmp_path)
+    settings.PRERENDER_BASE_URL = 'http://testserver'
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    cache.clear()
+    url = list_url(1)
+    assert APIClient().get(url).data['count'] == 0
+
+    # Счётчики поколений увеличил другой процесс: запись в кэше устарела.
+    Recipe.objects.create(
+        author=User.objects.create_user(
+            email='a@example.com', username='a', password='secret-pass'),
+        name='Суп', text='t', cooking_time=1, image='r.png')
+    assert prerender(url)
+    assert b'"count":1' in file_path(url).read_bytes()
+
+
+def test_prerender_requires_public_base_url(settings, tmp_path):
+    settings.PRERENDER_ROOT = str(tmp_path)
+    for base_url in ('', 'http://localhost'):
+        settings.PRERENDER_BASE_URL = base_url
+        with pytest.raises(ImproperlyConfigured):
+            apps.get_app_config('api').ready()
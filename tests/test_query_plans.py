@@ -0,0 +1,174 @@
+"""Планы горячих запросов: без полного просмотра таблиц и лишних сортировок.
+
+На PostgreSQL перед EXPLAIN отключаются seqscan и sort, поэтому они
+остаются в плане только когда подходящего индекса нет вообще.
+"""
+import re
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.db.models import Count, Sum
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.flat import flat_recipe
+from recipes.filters import IngredientFilter, RecipeFilter
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCart,
+    Tag,
+)
+from recipes.search import invalidate_ingredient_index
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+USERS = 50
+RECIPES = 1000
+INGREDIENTS = 300
+PAGE = 6
+
+FULL_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(\S+)'),
+    'postgresql': re.compile(r'Seq Scan on (\S+)'),
+}
+SORT = {
+    'sqlite': re.compile(r'USE TEMP B-TREE'),
+    'postgresql': re.compile(r'(?<![\w ])(Incremental )?Sort\b'),
+}
+
+
+@pytest.fixture
+def dataset():
+    users = User.objects.bulk_create(
+        User(email=f'user{i}@example.com', username=f'user{i}')
+        for i in range(USERS)
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+        for i in range(5)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'соль {i}', measurement_unit='г')
+        for i in range(INGREDIENTS)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=users[i % USERS], name=f'Рецепт {i}', text='t',
+            cooking_time=1, image='r.png',
+        )
+        for i in range(RECIPES)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tags[i % len(tags)])
+        for i, recipe in enumerate(recipes)
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe=recipe,
+            ingredient=ingredients[(i + shift) % INGREDIENTS],
+            amount=1,
+        )
+        for i, recipe in enumerate(recipes)
+        for shift in range(5)
+    )
+    user = users[0]
+    Favorite.objects.bulk_create(
+        Favorite(user=user, recipe=recipe) for recipe in recipes[::50]
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=user, recipe=recipe) for recipe in recipes[::40]
+    )
+    Follow.objects.bulk_create(
+        Follow(user=user, author=author) for author in users[1:11]
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    invalidate_ingredient_index()
+    return {'user': user, 'tags': tags}
+
+
+def request_for(user):
+    request = Request(APIRequestFactory().get('/'))
+    request.user = user
+    return request
+
+
+def recipe_page(filters, user=None):
+    queryset = RecipeFilter(
+        filters,
+        queryset=Recipe.objects.all(),
+        request=request_for(user or AnonymousUser()),
+    ).qs
+    return queryset.values(*flat_recipe.columns)[:PAGE]
+
+
+def explain(queryset):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('SET LOCAL enable_sort = off')
+    return queryset.explain()
+
+
+def assert_plan(queryset, allow_sort=False):
+    plan = explain(queryset)
+    vendor = connection.vendor
+    assert not FULL_SCAN[vendor].findall(plan), plan
+    if not allow_sort:
+        assert not SORT[vendor].search(plan), plan
+
+
+def test_recipe_feed(dataset):
+    assert_plan(recipe_page({}))
+
+
+def test_recipe_feed_by_author(dataset):
+    assert_plan(recipe_page({'author': dataset['user'].id}))
+
+
+def test_recipe_feed_by_tags(dataset):
+    slugs = [tag.slug for tag in dataset['tags'][:2]]
+    assert_plan(recipe_page({'tags': slugs}))
+
+
+@pytest.mark.parametrize('flag', ['is_favorited', 'is_in_shopping_cart'])
+def test_user_recipe_lists(dataset, flag):
+    # Сортируется только собственный список пользователя.
+    assert_plan(recipe_page({flag: 1}, dataset['user']), allow_sort=True)
+
+
+def test_shopping_cart_totals(dataset):
+    assert_plan(
+        RecipeIngredient.objects
+        .filter(recipe__in_carts__user=dataset['user'])
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(total_amount=Sum('amount'))
+        .order_by('ingredient__name'),
+        allow_sort=True,
+    )
+
+
+def test_subscriptions(dataset):
+    assert_plan(
+        User.objects.filter(following__user=dataset['user'])
+        .annotate(recipes_count=Count('recipes'))[:PAGE],
+        allow_sort=True,
+    )
+
+
+def test_followers(dataset):
+    assert_plan(Follow.objects.filter(author=dataset['user']))
+
+
+def test_ingredient_search(dataset):
+    assert_plan(
+        IngredientFilter({'name': 'сол'}, queryset=Ingredient.objects.all())
+        .qs,
+        allow_sort=True,
+    )
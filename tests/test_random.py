@@ -0,0 +1,123 @@
+import time
+
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import discovery
+from recipes.models import Recipe, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    dinner = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+    recipes = Recipe.objects.bulk_create(
+        Recipe(author=author, name=f'Рецепт {number}', text='t',
+               cooking_time=1, image='r.png')
+        for number in range(30)
+    )
+    for recipe in recipes[:10]:
+        recipe.tags.add(dinner)
+    return recipes
+
+
+def ids(response):
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()]
+
+
+def test_random_returns_distinct_recipes_with_tags(catalogue):
+    client = APIClient()
+    sample = ids(client.get('/api/recipes/random/', {'n': 5}))
+    assert len(sample) == len(set(sample)) == 5
+
+    dinner = {recipe.id for recipe in catalogue[:10]}
+    sample = ids(client.get(
+        '/api/recipes/random/', {'n': 50, 'tags': ['dinner', 'lunch']}
+    ))
+    assert set(sample) == dinner
+    assert ids(client.get('/api/recipes/random/', {'tags': 'unknown'})) == []
+
+
+def test_query_count_does_not_depend_on_catalogue_size(
+    catalogue, django_assert_max_num_queries
+):
+    # Два запроса на перестроение индекса (RANDOM_INDEX_TTL = 0 в тестах),
+    # один на выборку строк и три на теги, ингредиенты и авторов.
+    with django_assert_max_num_queries(6):
+        assert len(ids(APIClient().get('/api/recipes/random/', {'n': 3}))) == 3
+
+
+def test_popular_mode_prefers_popular_recipes(catalogue):
+    favourite = catalogue[-1]
+    Recipe.objects.filter(id=favourite.id).update(popularity=100_000)
+    client = APIClient()
+    draws = [
+        ids(client.get('/api/recipes/random/', {'mode': 'popular'}))[0]
+        for _ in range(5)
+    ]
+    assert draws.count(favourite.id) >= 4
+    assert client.get(
+        '/api/recipes/random/', {'mode': 'shuffle'}
+    ).status_code == 400
+
+
+def test_deleted_recipes_are_skipped(catalogue, settings):
+    settings.RANDOM_INDEX_TTL = 300
+    discovery.sample_index.invalidate()
+    discovery.get_sample_index()
+    deleted = {recipe.id for recipe in catalogue[:20]}
+    Recipe.objects.filter(id__in=deleted).delete()
+
+    rows = discovery.random_recipes(Recipe.objects.values('id'), [], 10)
+    sample = [row['id'] for row in rows]
+    assert sample
+    assert len(sample) == len(set(sample))
+    assert not deleted & set(sample)
+
+
+def test_stale_index_is_served_while_rebuilt_in_background(
+    transactional_db, settings
+):
+    settings.RANDOM_INDEX_TTL = 300
+    settings.REBUILD_INDEXES_IN_BACKGROUND = True
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    old = Recipe.objects.create(
+        author=author, name='Суп', text='t', cooking_time=1, image='r.png')
+    stale = discovery.sample_index.rebuild()
+    assert list(stale.ids) == [old.id]
+
+    new = Recipe.objects.create(
+        author=author, name='Каша', text='t', cooking_time=1, image='r.png')
+    discovery.sample_index.invalidate()
+    assert discovery.get_sample_index() is stale
+    deadline = time.monotonic() + 5
+    while discovery.get_sample_index() is stale:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert list(discovery.get_sample_index().ids) == [old.id, new.id]
+
+
+def test_tags_of_hidden_recipes_are_not_indexed(catalogue):
+    hidden = catalogue[-1]
+    hidden.tags.add(Tag.objects.get(slug='dinner'))
+    Recipe.objects.filter(id=hidden.id).update(deleted_at=timezone.now())
+    discovery.sample_index.invalidate()
+    sample = ids(APIClient().get(
+        '/api/recipes/random/', {'n': 50, 'tags': 'dinner'}))
+    assert set(sample) == {recipe.id for recipe in catalogue[:10]}
+
+
+def test_tag_rows_without_recipe_rows_are_skipped():
+    # Связь появилась между чтением рецептов и тегов.
+    index = discovery.RecipeSampleIndex(
+        [(1, 0), (3, 0)], [(1, 'dinner'), (2, 'dinner'), (4, 'dinner')])
+    assert index.sample(['dinner'], 5) == [1]
+    assert index.sample(['dinner'], 5, discovery.POPULAR) == [1]
@@ -0,0 +1,81 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from recipes.ranking import bump_recipe_scores, decay_trending_scores
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    return [
+        Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='t',
+            cooking_time=1, image='r.png')
+        for number in range(5)
+    ]
+
+
+def ordered(ordering):
+    response = APIClient().get('/api/recipes/', {'ordering': ordering})
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()['results']]
+
+
+def scores():
+    return list(
+        Recipe.objects.order_by('pk').values_list('trending_score', flat=True)
+    )
+
+
+def test_popular_and_trending_orderings(recipes):
+    first, second, third, fourth, fifth = recipes
+    bump_recipe_scores([second.id, third.id], 1)
+    bump_recipe_scores([third.id], 1)
+    # Равные рейтинги идут от новых к старым.
+    assert ordered('popular') == [
+        third.id, second.id, fifth.id, fourth.id, first.id]
+
+    Recipe.objects.filter(pk=second.id).update(popularity=10)
+    Recipe.objects.filter(pk=fourth.id).update(trending_score=5)
+    assert ordered('popular')[0] == second.id
+    assert ordered('trending')[:2] == [fourth.id, third.id]
+    assert APIClient().get(
+        '/api/recipes/', {'ordering': 'random'}
+    ).status_code == 400
+
+
+def test_scores_never_go_below_zero(recipes):
+    bump_recipe_scores([recipes[0].id], -1)
+    recipe = Recipe.objects.get(pk=recipes[0].id)
+    assert (recipe.popularity, recipe.trending_score) == (0, 0)
+
+
+def test_decay_updates_in_batches_and_zeroes_small_scores(recipes):
+    for recipe, score in zip(recipes, (8, 4, 0.015, 0, 2)):
+        Recipe.objects.filter(pk=recipe.pk).update(trending_score=score)
+    with CaptureQueriesContext(connection) as queries:
+        assert decay_trending_scores(0.5, batch_size=2) == 4
+    updates = [
+        query for query in queries
+        if query['sql'].startswith('UPDATE "recipes_recipe"')
+    ]
+    assert len(updates) == 2
+    assert scores() == [4, 2, 0, 0, 1]
+
+
+def test_update_recipe_scores_command(recipes, settings):
+    settings.TRENDING_HALF_LIFE_HOURS = 2
+    Recipe.objects.filter(pk=recipes[0].pk).update(
+        trending_score=8, popularity=3)
+    call_command('update_recipe_scores', hours=4, recount=True)
+    recipe = Recipe.objects.get(pk=recipes[0].pk)
+    assert recipe.trending_score == 2
+    assert recipe.popularity == 0
@@ -0,0 +1,171 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from jobs.models import Job
+from jobs.queue import execute
+from recipes.models import (
+    Ingredient, Recipe, RecipeBucket, RecipeIngredient, Tag,
+)
+from recipes.serializers import RecipeWriteSerializer
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+
+
+@pytest.fixture
+def tags():
+    return Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}', slug=f't{number}')
+        for number in range(3)
+    )
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(31)
+    )
+
+
+def payload(ingredients, tags, amount=1):
+    return {
+        'name': 'Суп', 'text': 't', 'cooking_time': 1, 'image': IMAGE,
+        'tags': [tag.id for tag in tags],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient in ingredients
+        ],
+    }
+
+
+def save(author, data, instance=None):
+    request = Request(APIRequestFactory().post('/'))
+    request.user = author
+    serializer = RecipeWriteSerializer(
+        instance, data=data, partial=instance is not None,
+        context={'request': request},
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.save()
+
+
+def statements(queries):
+    # SAVEPOINT — след транзакции теста; в работе на их месте BEGIN и
+    # COMMIT той же транзакции.
+    return [
+        query['sql'] for query in queries
+        if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+    ]
+
+
+def test_recipe_save_takes_under_ten_statements(
+    author, tags, ingredients, django_capture_on_commit_callbacks
+):
+    # Две проверки id, рецепт, журнал, теги, ингредиенты, задача.
+    with CaptureQueriesContext(connection) as queries, \
+            django_capture_on_commit_callbacks(execute=True):
+        recipe = save(author, payload(ingredients[:30], tags[:2]))
+    assert len(statements(queries)) < 10
+    assert recipe.tags.count() == 2
+    assert recipe.recipe_ingredients.count() == 30
+
+    # Правка в форме присылает рецепт целиком: проверки id вместе с
+    # текущими связями, INSERT ... ON CONFLICT изменённых строк, рецепт
+    # и журнал.
+    edited = payload(ingredients[:30], tags[:2])
+    edited['text'] = 'Новый текст'
+    edited['ingredients'][0]['amount'] = 5
+    with CaptureQueriesContext(connection) as queries, \
+            django_capture_on_commit_callbacks(execute=True):
+        save(author, edited, recipe)
+    assert len(statements(queries)) < 10
+    assert dict(
+        RecipeIngredient.objects.filter(recipe=recipe)
+        .values_list('ingredient_id', 'amount')
+    ) == {
+        ingredient.id: 5 if ingredient == ingredients[0] else 1
+        for ingredient in ingredients[:30]
+    }
+
+    # Меняются и теги, и состав, и количество: по DELETE и INSERT на
+    # теги и ингредиенты, задача на пересчёт сигнатуры.
+    changed = payload(ingredients[1:], tags[1:], amount=2)
+    with CaptureQueriesContext(connection) as queries, \
+            django_capture_on_commit_callbacks(execute=True):
+        save(author, changed, recipe)
+    assert len(statements(queries)) < 10
+    assert sorted(recipe.tags.values_list('id', flat=True)) == [
+        tag.id for tag in tags[1:]]
+    assert sorted(
+        recipe.recipe_ingredients.values_list('ingredient_id', 'amount')
+    ) == [(ingredient.id, 2) for ingredient in ingredients[1:]]
+
+
+def test_update_touches_only_changed_rows(author, tags, ingredients):
+    recipe = save(author, payload(ingredients[:3], tags[:1]))
+    kept, updated = (
+        RecipeIngredient.objects.get(recipe=recipe, ingredient=ingredient)
+        for ingredient in ingredients[:2]
+    )
+    changed = payload(ingredients[:3], tags[:1])
+    changed['ingredients'][1]['amount'] = 7
+    with CaptureQueriesContext(connection) as queries:
+        save(author, changed, recipe)
+    assert not any(
+        query['sql'].startswith('DELETE FROM "recipes_recipe_tags"')
+        for query in queries
+    )
+    assert RecipeIngredient.objects.filter(pk=kept.pk).exists()
+    # Количество меняется на месте, строка не пересоздаётся.
+    assert RecipeIngredient.objects.get(pk=updated.pk).amount == 7
+
+
+def test_signature_is_refreshed_in_background(
+    author, tags, ingredients, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = save(author, payload(ingredients[:3], tags[:1]))
+    assert not RecipeBucket.objects.exists()
+    for job in Job.objects.all():
+        assert execute(job), job.last_error
+    assert RecipeBucket.objects.filter(recipe=recipe).count() == 16
+
+
+def test_create_response_does_not_depend_on_ingredient_count(
+    author, tags, ingredients
+):
+    client = APIClient()
+    client.force_authenticate(author)
+
+    def create(count):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.post(
+                '/api/recipes/', payload(ingredients[:count], tags[:2]),
+                format='json',
+            )
+        assert response.status_code == 201
+        assert len(response.json()['ingredients']) == count
+        return len(queries)
+
+    assert create(3) == create(30)
+    assert Recipe.objects.count() == 2
@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from api.response_cache import _fetch
+from recipes.generations import generations_bumped
+from recipes.models import Recipe, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+def test_single_flight_builds_once():
+    builds = []
+
+    def build_response():
+        builds.append(1)
+        time.sleep(0.2)
+        return Response({'ok': True})
+
+    responses = []
+    threads = [
+        threading.Thread(
+            target=lambda: responses.append(_fetch('key', build_response))
+        )
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
+    assert [response.data for response in responses] == [{'ok': True}] * 8
+
+
+def test_response_cache_requires_shared_cache(settings):
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    settings.SHARED_CACHE = False
+    with pytest.raises(ImproperlyConfigured):
+        apps.get_app_config('api').ready()
+    settings.SHARED_CACHE = True
+    apps.get_app_config('api').ready()
+
+
+@pytest.mark.django_db
+def test_generations_invalidate_anonymous_list(
+    settings, django_capture_on_commit_callbacks
+):
+    settings.RESPONSE_CACHE_TIMEOUT = 60
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    breakfast = Tag.objects.create(
+        name='Завтрак', color='#E26C2D', slug='breakfast')
+    Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe = Recipe.objects.create(
+            author=author, name='Каша', text='t', cooking_time=1,
+            image='r.png')
+        recipe.tags.set([breakfast])
+    client = APIClient()
+    dinner = client.get('/api/recipes/', {'tags': 'dinner'})
+    assert client.get('/api/recipes/').data['count'] == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.name = 'Овсянка'
+        recipe.save()
+    response = client.get('/api/recipes/')
+    assert response.data['results'][0]['name'] == 'Овсянка'
+    assert client.get(
+        '/api/recipes/', {'tags': 'dinner'}
+    )['ETag'] == dinner['ETag']
+
+
+@pytest.mark.django_db
+def test_profile_save_bumps_only_scopes_of_author_recipes(
+    django_capture_on_commit_callbacks
+):
+    bumped = []
+
+    def collect(sender, scopes, **kwargs):
+        bumped.append(scopes)
+
+    generations_bumped.connect(collect)
+    try:
+        author, reader = (
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name,
+                password='secret-pass')
+            for name in ('a', 'r')
+        )
+        dinner = Tag.objects.create(
+            name='Ужин', color='#8775D2', slug='dinner')
+        recipe = Recipe.objects.create(
+            author=author, name='Суп', text='t', cooking_time=1,
+            image='r.png')
+        recipe.tags.set([dinner])
+        bumped.clear()
+        with django_capture_on_commit_callbacks(execute=True):
+            reader.first_name = 'Читатель'
+            reader.save()
+            author.save(update_fields=['last_login'])
+        assert bumped == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            author.first_name = 'Анна'
+            author.save()
+        assert bumped == [{
+            'list', f'recipe:{recipe.id}', f'author:{author.id}',
+            'tag:dinner',
+        }]
+    finally:
+        generations_bumped.disconnect(collect)
@@ -0,0 +1,60 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from recipes import indexes, search
+from recipes.models import Ingredient
+
+NAMES = [
+    'картофель', 'картофельный крахмал', 'морковь', 'молоко',
+    'молоко сгущённое', 'сливочное масло', 'масло подсолнечное',
+]
+
+
+@pytest.fixture
+def index():
+    return search.IngredientIndex(enumerate(NAMES))
+
+
+def names(ids):
+    return [NAMES[pk] for pk in ids]
+
+
+def test_prefix_matches_come_first_in_name_order(index):
+    assert names(index.search('Мол', 10)) == ['молоко', 'молоко сгущённое']
+    assert names(index.search('масло', 10)) == [
+        'масло подсолнечное', 'сливочное масло']
+
+
+def test_typos_are_tolerated(index):
+    assert names(index.search('картофль', 10)) == [
+        'картофель', 'картофельный крахмал']
+    assert names(index.search('моркофь', 10)) == ['морковь']
+    # Короткий запрос ищется только по началу названия.
+    assert index.search('млк', 10) == []
+
+
+def test_limit_keeps_best_matches(index):
+    assert names(index.search('картофель', 1)) == ['картофель']
+
+
+@pytest.mark.django_db
+def test_changes_reach_every_process(
+    monkeypatch, django_capture_on_commit_callbacks
+):
+    monkeypatch.setattr(indexes, 'CHECK_INTERVAL', 0)
+    cache.clear()
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    search.ingredient_index.rebuild()
+    # Индекс другого процесса: изменение он видит только через кэш.
+    other = search.BackgroundIndex(
+        search.build_ingredient_index, 'INGREDIENT_INDEX_TTL',
+        version_key=search.ingredient_index._version_key,
+    )
+    other.rebuild()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='сахар', measurement_unit='г')
+    assert len(other.get().ids) == 2
+    response = APIClient().get('/api/ingredients/', {'name': 'сахр'})
+    assert [item['name'] for item in response.json()] == ['сахар']
@@ -0,0 +1,38 @@
+import pytest
+
+from api.shortlinks import ShortLinkWSGI, decode, encode, resolve
+from recipes.models import Recipe
+
+
+@pytest.mark.parametrize('number', [0, 1, 61, 62, 3843, 2 ** 63 - 1])
+def test_codes_round_trip(number):
+    assert decode(encode(number)) == number
+
+
+def test_redirect_skips_django():
+    def django_app(environ, start_response):
+        raise AssertionError('Запрос не должен дойти до Django.')
+
+    app = ShortLinkWSGI(django_app)
+    responses = []
+    app({'PATH_INFO': f'/r/{encode(125)}'},
+        lambda status, headers: responses.append((status, dict(headers))))
+    status, headers = responses[0]
+    assert status.startswith('301')
+    assert headers['Location'] == '/recipes/125'
+
+
+@pytest.mark.parametrize('path', ['/r/', '/r/a-b', '/r/0a', '/r/' + 'z' * 12])
+def test_invalid_codes_are_not_resolved(path):
+    assert resolve(path) is None
+
+
+@pytest.mark.django_db
+def test_get_link(client, django_user_model):
+    author = django_user_model.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    recipe = Recipe.objects.create(
+        author=author, name='r', text='t', cooking_time=1, image='r.png')
+    response = client.get(f'/api/recipes/{recipe.id}/get-link/')
+    assert response.json()['short-link'].endswith('/r/' + encode(recipe.id))
+    assert client.get('/api/recipes/999999/get-link/').status_code == 404
@@ -0,0 +1,96 @@
+import pytest
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes import similarity
+from recipes.models import (
+    Ingredient, Recipe, RecipeBucket, RecipeIngredient, RecipeSignature, Tag,
+)
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def author():
+    return User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+
+
+@pytest.fixture
+def ingredients():
+    return Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(12)
+    )
+
+
+def make_recipe(author, name, ingredients, tags=(), signed=True):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='t', cooking_time=1, image='r.png')
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=1)
+        for ingredient in ingredients
+    )
+    if signed:
+        similarity.update_recipe_signature(
+            recipe, [item.id for item in ingredients],
+            [tag.id for tag in tags], created=True,
+        )
+    return recipe
+
+
+def similar(recipe, **params):
+    response = APIClient().get(f'/api/recipes/{recipe.id}/similar/', params)
+    assert response.status_code == 200
+    return [item['id'] for item in response.json()]
+
+
+def test_minhash_estimates_jaccard():
+    left = {f'i{number}' for number in range(20)}
+    right = {f'i{number}' for number in range(10, 30)}
+    same = sum(
+        a == b for a, b in zip(
+            similarity.minhash(left), similarity.minhash(right)
+        )
+    )
+    # Точный коэффициент Жаккара — 1/3.
+    assert 0.1 < same / similarity.NUM_HASHES < 0.6
+    assert len(similarity.lsh_buckets(similarity.minhash(left))) == (
+        similarity.BANDS
+    )
+
+
+def test_similar_recipes_are_ranked_by_jaccard(author, ingredients):
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    base = make_recipe(author, 'Основа', ingredients[:8], [tag])
+    close = make_recipe(author, 'Почти то же', ingredients[:7], [tag])
+    near = make_recipe(author, 'Похожий', ingredients[:6], [tag])
+    make_recipe(author, 'Другой', ingredients[8:])
+    assert similar(base) == [close.id, near.id]
+    assert similar(base, limit=1) == [close.id]
+
+
+def test_deleted_neighbours_do_not_take_places(author, ingredients):
+    base = make_recipe(author, 'Основа', ingredients[:8])
+    close = make_recipe(author, 'Почти то же', ingredients[:7])
+    near = make_recipe(author, 'Похожий', ingredients[:6])
+    Recipe.objects.filter(pk=close.pk).update(deleted_at=timezone.now())
+    assert similarity.similar_recipe_ids(base, 1) == [near.id]
+    assert similar(base, limit=1) == [near.id]
+
+
+def test_signature_is_not_written_on_get(author, ingredients):
+    base = make_recipe(author, 'Основа', ingredients[:8], signed=False)
+    close = make_recipe(author, 'Почти то же', ingredients[:8])
+    assert similar(base) == [close.id]
+    assert not RecipeSignature.objects.filter(recipe=base).exists()
+    assert not RecipeBucket.objects.filter(recipe=base).exists()
+
+
+def test_recipes_without_features_share_no_buckets(author):
+    empty = [make_recipe(author, f'Пустой {number}', []) for number in (1, 2)]
+    assert RecipeSignature.objects.filter(recipe=empty[0]).exists()
+    assert not RecipeBucket.objects.exists()
+    assert similar(empty[0]) == []
@@ -0,0 +1,56 @@
+import pytest
+from django.conf import settings
+from rest_framework.test import APIClient
+
+from users import graph
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def people(monkeypatch):
+    users = {
+        name: User.objects.create_user(
+            email=f'{name}@example.com', username=name,
+            password='secret-pass')
+        for name in ('me', 'a', 'b', 'c', 'd', 'e')
+    }
+    for user, author in [
+        ('me', 'a'), ('me', 'b'),
+        ('a', 'c'), ('a', 'd'), ('a', 'me'),
+        ('b', 'c'), ('b', 'e'), ('b', 'a'),
+    ]:
+        Follow.objects.create(user=users[user], author=users[author])
+    graph.build_follow_graph(settings.FOLLOW_GRAPH_PATH)
+    monkeypatch.setattr(graph, '_graph', None)
+    return users
+
+
+def suggestions(user, **params):
+    client = APIClient()
+    client.force_authenticate(user)
+    response = client.get('/api/users/suggestions/', params)
+    assert response.status_code == 200
+    return [item['username'] for item in response.json()]
+
+
+def test_snapshot_rows_list_followed_authors(people):
+    snapshot = graph.get_follow_graph()
+    ids = {user.id: name for name, user in people.items()}
+    assert [ids[pk] for pk in snapshot.following(people['b'].id)] == [
+        'a', 'c', 'e']
+    assert list(snapshot.following(people['c'].id)) == []
+    assert list(snapshot.following(10_000)) == []
+
+
+def test_authors_are_ranked_by_overlap(people):
+    # c — у двух подписок, d и e — у одной; себя и подписки не предлагают.
+    assert suggestions(people['me']) == ['c', 'd', 'e']
+    assert suggestions(people['me'], limit=1) == ['c']
+
+
+def test_follows_made_after_snapshot_are_excluded(people):
+    Follow.objects.create(user=people['me'], author=people['d'])
+    assert suggestions(people['me']) == ['c', 'e']
+    assert APIClient().get('/api/users/suggestions/').status_code == 401
@@ -0,0 +1,125 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api import sync as sync_module
+from jobs.models import Job
+from jobs.queue import execute
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalogue():
+    author = User.objects.create_user(
+        email='a@example.com', username='a', password='secret-pass')
+    tag = Tag.objects.create(name='Ужин', color='#8775D2', slug='dinner')
+    salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+    recipes = []
+    for number in range(3):
+        recipe = Recipe.objects.create(
+            author=author, name=f'Рецепт {number}', text='t',
+            cooking_time=1, image='r.png')
+        recipe.tags.add(tag)
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=salt, amount=1)
+        recipes.append(recipe)
+    return {'author': author, 'tag': tag, 'recipes': recipes}
+
+
+def sync(client, since, limit=None):
+    params = {'since': since}
+    if limit is not None:
+        params['limit'] = limit
+    response = client.get('/api/sync/', params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_sync_returns_only_changes_after_position(catalogue):
+    client = APIClient()
+    position = client.get('/api/sync/').json()['next']
+    assert position > 0
+    first, second, third = catalogue['recipes']
+
+    first.name = 'Новое название'
+    first.save()
+    first.save()
+    deleted_id = second.id
+    second.delete()
+    catalogue['tag'].name = 'Поздний ужин'
+    catalogue['tag'].save()
+
+    page = sync(client, position)
+    assert not page['has_more']
+    changes = {(item['type'], item['id']): item for item in page['changes']}
+    tombstone = changes[('recipe', deleted_id)]
+    assert tombstone == {
+        'seq': tombstone['seq'], 'type': 'recipe',
+        'id': deleted_id, 'action': 'delete',
+    }
+    assert changes[('recipe', first.id)]['data']['name'] == 'Новое название'
+    assert changes[('tag', catalogue['tag'].id)]['data']['name'] == (
+        'Поздний ужин'
+    )
+    # Тег встроен в рецепты, поэтому они тоже считаются изменёнными.
+    assert changes[('recipe', third.id)]['data']['tags'][0]['name'] == (
+        'Поздний ужин'
+    )
+    seqs = [item['seq'] for item in page['changes']]
+    assert seqs == sorted(seqs)
+    assert page['next'] == seqs[-1]
+    assert sync(client, page['next'])['changes'] == []
+
+
+def test_sync_pages_through_log(catalogue):
+    client = APIClient()
+    since, seen, pages = 0, {}, 0
+    while True:
+        page = sync(client, since, limit=2)
+        pages += 1
+        for item in page['changes']:
+            seen[(item['type'], item['id'])] = item['action']
+        since = page['next']
+        if not page['has_more']:
+            break
+    assert pages > 1
+    assert {pk for kind, pk in seen if kind == 'recipe'} == {
+        recipe.id for recipe in catalogue['recipes']
+    }
+
+
+def test_sync_rejects_invalid_position():
+    response = APIClient().get('/api/sync/', {'since': 'abc'})
+    assert response.status_code == 400
+
+
+def test_visible_seq_waits_for_transactions_running_at_mark():
+    # Транзакция 7 получила seq 10 и ещё не зафиксирована.
+    marks, visible = sync_module.advance([], 0, 12, frozenset({7, 9}))
+    assert visible == 0
+    marks, visible = sync_module.advance(marks, visible, 15, frozenset({7}))
+    assert visible == 0
+    marks, visible = sync_module.advance(marks, visible, 16, frozenset({20}))
+    assert (marks, visible) == ([(16, frozenset({20}))], 15)
+    assert sync_module.advance(marks, visible, 16, frozenset())[1] == 16
+    assert sync_module._parse_snapshot('5:12:7,9') == frozenset({7, 9})
+    assert sync_module._parse_snapshot('12:12:') == frozenset()
+
+
+def test_author_profile_changes_are_logged_in_background(catalogue):
+    client = APIClient()
+    position = client.get('/api/sync/').json()['next']
+    author = catalogue['author']
+    author.first_name = 'Анна'
+    author.save()
+    assert sync(client, position)['changes'] == []
+
+    for job in Job.objects.all():
+        assert execute(job), job.last_error
+    page = sync(client, position)
+    assert {item['id'] for item in page['changes']} == {
+        recipe.id for recipe in catalogue['recipes']
+    }
+    assert page['changes'][0]['data']['author']['first_name'] == 'Анна'
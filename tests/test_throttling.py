@@ -0,0 +1,55 @@
+import pytest
+from rest_framework.test import APIClient
+
+from api.prerender import render
+from api.throttling import MmapBucketStore
+from users.models import User
+
+
+def test_bucket_is_shared_between_store_instances(tmp_path):
+    path = str(tmp_path / 'buckets.bin')
+    worker, other_worker = MmapBucketStore(path, 64), MmapBucketStore(path, 64)
+
+    assert [worker.consume('read:ip:1', 3, 1.0, 100.0) for _ in range(3)] == [
+        0.0, 0.0, 0.0,
+    ]
+    assert other_worker.consume('read:ip:1', 3, 1.0, 100.0) == 1.0
+    assert other_worker.consume('read:ip:2', 3, 1.0, 100.0) == 0.0
+    # Через секунду ведро пополняется на один жетон.
+    assert worker.consume('read:ip:1', 3, 1.0, 101.0) == 0.0
+    assert worker.consume('read:ip:1', 3, 1.0, 101.0) > 0
+
+
+@pytest.mark.django_db
+def test_route_classes_are_limited_per_user(settings, tmp_path):
+    settings.THROTTLE_MMAP_PATH = str(tmp_path / 'buckets.bin')
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            'ip': '1000/min', 'read': '2/min', 'write': '1000/min',
+        },
+    }
+    guest = APIClient()
+    assert guest.get('/api/tags/').status_code == 200
+    assert guest.get('/api/ingredients/').status_code == 200
+    response = guest.get('/api/tags/')
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(
+        email='u@example.com', username='u', password='secret-pass'))
+    assert client.get('/api/tags/').status_code == 200
+
+
+@pytest.mark.django_db
+def test_internal_renders_are_not_throttled(settings, tmp_path):
+    settings.THROTTLE_MMAP_PATH = str(tmp_path / 'buckets.bin')
+    settings.PRERENDER_BASE_URL = 'http://testserver'
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            'ip': '1/min', 'read': '1/min', 'write': '1/min',
+        },
+    }
+    assert all(render('/api/tags/') is not None for _ in range(3))